@@ -1,32 +1,52 @@
 
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash, g, make_response
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash, g, make_response, send_file
 from werkzeug.security import generate_password_hash, check_password_hash
 import concurrent.futures
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-from sentence_transformers import SentenceTransformer
+import multiprocessing
 import feedparser
 import sqlite3
 import os
-import torch
 import json
 from datetime import datetime
-import faiss
 import numpy as np
-import nltk
 import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
 from bs4 import BeautifulSoup
-from sumy.parsers.plaintext import PlaintextParser
-from sumy.nlp.tokenizers import Tokenizer
-from sumy.summarizers.text_rank import TextRankSummarizer
+from keyword_classifier import KeywordClassifier
+from near_duplicates import NearDuplicateIndex, minhash_signature
+from summarizer import TEXTRANK_VERSION, excerpt, summarize, summarize_articles
+from pdf_export import bookmark_flowables, note_flowables, render_pdf, text_flowables
+from metrics import Counter, Gauge, Histogram, SIZE_BUCKETS, render_metrics, start_snapshots
+from microbatch import MicroBatcher
+from classifier_backends import (CLASSIFIER_DIR, CLASSIFY_BATCH_SIZE, CLASSIFY_MAX_LENGTH, classifier_version_tag,
+                                 load_classifier_backend, softmax)
 import ssl
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
 import io
 from apscheduler.schedulers.background import BackgroundScheduler
 import logging
+import queue
+import time
+import threading
+from functools import lru_cache
 import hashlib  # For better article_id generation
+import tempfile
+import glob
+import base64
+import pickle
+from collections import OrderedDict
+import calendar
+import html
+import re
+import zlib
+import cProfile
+import pstats
+from email.utils import parsedate_to_datetime
+
+# Heavy ML, vector and PDF libraries (transformers, sentence_transformers, torch,
+# faiss, nltk, sumy, reportlab) are imported where they are used, so the web tier
+# starts serving before they are loaded.
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -46,15 +66,38 @@ else:
 
 # Initialize NLTK data
 def initialize_nltk():
+    import nltk
     try:
         nltk.data.find('tokenizers/punkt')
     except LookupError:
         nltk.download('punkt', quiet=True)
 
-initialize_nltk()
-
 app = Flask(__name__)
-app.secret_key = os.urandom(24)
+
+def load_secret_key():
+    # Every worker process must sign sessions with the same key, and keeping it
+    # across restarts keeps users logged in; UPSC_SECRET_KEY overrides the file
+    key = os.environ.get('UPSC_SECRET_KEY')
+    if key:
+        return key
+
+    path = os.path.join(app.instance_path, 'secret_key')
+    if not os.path.exists(path):
+        os.makedirs(app.instance_path, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=app.instance_path)
+        os.chmod(tmp_path, 0o600)  # Anyone who can read the key can forge sessions
+        with os.fdopen(fd, 'wb') as f:
+            f.write(os.urandom(32))
+        try:
+            os.link(tmp_path, path)  # Fails if another process created it first
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+    with open(path, 'rb') as f:
+        return f.read()
+
+app.secret_key = load_secret_key()
 
 # Configuration
 GS_PAPERS = ["GS1", "GS2", "GS3", "GS4"]
@@ -64,23 +107,201 @@ RSS_FEEDS = {
     "Times of India": "https://timesofindia.indiatimes.com/rssfeedstopstories.cms"
 }
 
+# HTTP fetching
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+FETCH_TIMEOUT = 10
+FETCH_WORKERS = 16
+MAX_REQUESTS_PER_HOST = 4
+MAX_ENTRIES_PER_FEED = 20
+
+def create_http_session():
+    session = requests.Session()
+    session.headers.update({'User-Agent': USER_AGENT})
+    adapter = HTTPAdapter(pool_connections=len(RSS_FEEDS) * 2, pool_maxsize=FETCH_WORKERS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+http_session = create_http_session()
+
+feed_validators = {}  # feed url -> ETag / Last-Modified of the last fetch whose entries were all stored
+host_limits = {}
+host_limits_lock = threading.Lock()
+
+# Ingest pipeline
+PIPELINE_QUEUE_SIZE = 32
+PARSE_WORKERS = 4
+SUMMARIZE_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+# Summarizer workers start from a small forkserver that only imports summarizer.py,
+# not by forking this process with its writer, scheduler and model threads
+SUMMARIZE_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+SUMMARIZE_BATCH_SIZE = SUMMARIZE_WORKERS * 4
+STAGE_BATCH_WAIT = 0.5  # seconds a batched stage waits to fill a batch
+STORE_BATCH_SIZE = 32
+DEDUP_WINDOW_DAYS = 3  # stored articles a new article is compared against
+
 # FAISS Setup
 d = 384
-index = faiss.IndexFlatL2(d)
-news_db = {}
+FAISS_INDEX_PATH = 'upsc_news.faiss'
+EMBED_BATCH_SIZE = 32
+index = None
+news_db = {}  # FAISS id -> article id
+faiss_lock = threading.Lock()
+FAISS_RELOAD_INTERVAL = 30  # seconds between checks for an index saved by another process
+faiss_loaded_mtime = None
+faiss_checked_at = 0.0
+
+# Metrics (per process, scraped from /metrics). Under gunicorn every worker
+# also snapshots its values to UPSC_METRICS_DIR, and /metrics serves the merge
+# of all workers, whichever one answers the scrape.
+METRICS_DIR = os.environ.get('UPSC_METRICS_DIR')
+REQUEST_SECONDS = Histogram('upsc_request_seconds', 'HTTP request latency', ('endpoint', 'method', 'status'))
+DB_QUERY_SECONDS = Histogram('upsc_db_query_seconds', 'SQLite statement execution time', ('statement',))
+INGEST_STAGE_SECONDS = Histogram('upsc_ingest_stage_seconds', 'Busy time per ingest stage call', ('stage',))
+INGEST_STAGE_ITEMS = Counter('upsc_ingest_stage_items', 'Items processed by each ingest stage', ('stage',))
+INGEST_RUN_SECONDS = Histogram('upsc_ingest_run_seconds', 'Wall time of an ingest run',
+                               buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800))
+INGEST_ARTICLES = Counter('upsc_ingest_articles', 'Articles stored by ingest')
+INGEST_DUPLICATES = Counter('upsc_ingest_duplicates', 'Near-duplicates folded into stored articles')
+MODEL_INFERENCES = Counter('upsc_model_inferences', 'Texts run through each model', ('model',))
+MODEL_BATCH_SIZE = Histogram('upsc_model_batch_size', 'Texts per model call', ('model',), buckets=SIZE_BUCKETS)
+FAISS_VECTORS = Gauge('upsc_faiss_vectors', 'Vectors in the FAISS index',
+                      callback=lambda: index.ntotal if index is not None else 0)
+
+INFERENCE_WAIT_SECONDS = Histogram('upsc_inference_wait_seconds', 'Time on-demand inference requests wait for their batch',
+                                   ('model',), buckets=(0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0))
+INFERENCE_QUEUE_DEPTH = Gauge('upsc_inference_queue_depth', 'On-demand inference requests waiting for a batch', ('model',),
+                              callback=lambda: {(query_batcher.name,): query_batcher.queue_depth()},
+                              multiprocess_mode='sum')
+
+RETENTION_ARCHIVED = Counter('upsc_retention_archived_articles', 'Articles moved to the archive by maintenance')
+RETENTION_RECLAIMED_BYTES = Gauge('upsc_retention_reclaimed_bytes', 'Database bytes reclaimed by the last maintenance run')
+DATABASE_BYTES = Gauge('upsc_database_bytes', 'Size of the SQLite database and its WAL', callback=lambda: database_bytes())
+
+def record_inference(model_name, batch_size):
+    MODEL_INFERENCES.inc(batch_size, model=model_name)
+    MODEL_BATCH_SIZE.observe(batch_size, model=model_name)
 
 # Database setup
+DATABASE = 'upsc_news.db'
+DB_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -20000",  # ~20 MB page cache per connection
+    "PRAGMA mmap_size = 268435456",  # 256 MB
+    "PRAGMA temp_store = MEMORY",
+)
+WRITE_BATCH_SIZE = 64
+
+db_local = threading.local()
+write_queue = queue.Queue()
+writer_thread = None
+writer_lock = threading.Lock()
+
+STATEMENT_KINDS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'BEGIN', 'COMMIT', 'ROLLBACK',
+                   'SAVEPOINT', 'RELEASE', 'PRAGMA', 'CREATE', 'WITH'}
+
+class TimedConnection(sqlite3.Connection):
+    # Records execution time per statement kind; fetching rows afterwards is not included
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - start, statement=statement_kind(sql))
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - start, statement=statement_kind(sql))
+
+def statement_kind(sql):
+    words = sql.split(None, 1)
+    kind = words[0].upper() if words else ''
+    return kind if kind in STATEMENT_KINDS else 'OTHER'
+
+def connect_db():
+    conn = sqlite3.connect(DATABASE, timeout=5, factory=TimedConnection)
+    conn.row_factory = sqlite3.Row
+    for pragma in DB_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
 def get_db():
-    if not hasattr(g, 'sqlite_db'):
-        g.sqlite_db = sqlite3.connect('upsc_news.db')
-        g.sqlite_db.row_factory = sqlite3.Row
-        g.sqlite_db.execute("PRAGMA foreign_keys = ON")
-    return g.sqlite_db
+    # One connection per thread, reused across requests and ingest runs
+    conn = getattr(db_local, 'conn', None)
+    if conn is None:
+        conn = connect_db()
+        db_local.conn = conn
+    return conn
 
 @app.teardown_appcontext
 def close_db(error):
-    if hasattr(g, 'sqlite_db'):
-        g.sqlite_db.close()
+    # Connections outlive the request; just make sure no read transaction is left open
+    conn = getattr(db_local, 'conn', None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+
+def db_write(func, *args):
+    # Run func(db, *args) on the single writer thread and return a Future with its result.
+    # Writes queued together share one transaction; each runs in its own savepoint.
+    future = concurrent.futures.Future()
+    start_db_writer()
+    write_queue.put((func, args, future))
+    return future
+
+def start_db_writer():
+    global writer_thread
+    with writer_lock:
+        if writer_thread is None or not writer_thread.is_alive():
+            writer_thread = threading.Thread(target=run_db_writer, name="db-writer", daemon=True)
+            writer_thread.start()
+
+def run_db_writer():
+    db = connect_db()
+    db.isolation_level = None  # Transactions are managed explicitly below
+
+    while True:
+        batch = [write_queue.get()]
+        while len(batch) < WRITE_BATCH_SIZE:
+            try:
+                batch.append(write_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        outcomes = []
+        try:
+            db.execute('BEGIN IMMEDIATE')
+            for func, args, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                db.execute('SAVEPOINT write_op')
+                try:
+                    outcomes.append((future, func(db, *args), None))
+                    db.execute('RELEASE write_op')
+                except Exception as e:
+                    db.execute('ROLLBACK TO write_op')
+                    db.execute('RELEASE write_op')
+                    outcomes.append((future, None, e))
+            db.execute('COMMIT')
+        except sqlite3.Error as e:
+            logger.error(f"Database write batch failed: {e}")
+            if db.in_transaction:
+                db.execute('ROLLBACK')
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            continue
+
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
 
 def init_db():
     with app.app_context():
@@ -140,213 +361,1283 @@ def init_db():
             db.execute("PRAGMA user_version = 2")
             db.commit()
             logger.info("Database initialized with version 2 schema")
+            version = 2
+
+        if version < 3:
+            # Lets ingest skip already stored articles by link before fetching them
+            db.execute('CREATE INDEX IF NOT EXISTS idx_articles_link ON articles(link)')
+            db.execute("PRAGMA user_version = 3")
+            db.commit()
+            logger.info("Database migrated to version 3 schema")
+            version = 3
+
+        if version < 4:
+            # Serve the listing window, keyset ordering and counts from the index
+            db.execute('''CREATE INDEX IF NOT EXISTS idx_articles_listing
+                          ON articles(gs_paper, last_updated, date, id)''')
+            db.execute('''CREATE INDEX IF NOT EXISTS idx_articles_recent
+                          ON articles(last_updated, date, id)''')
+            db.execute("PRAGMA user_version = 4")
+            db.commit()
+            logger.info("Database migrated to version 4 schema")
+            version = 4
+
+        if version < 5:
+            # `date` holds the feed's RFC-822 text, which does not sort chronologically,
+            # so listings and range filters move to an integer epoch column
+            columns = [row['name'] for row in db.execute('PRAGMA table_info(articles)')]
+            if 'published_ts' not in columns:
+                db.execute('ALTER TABLE articles ADD COLUMN published_ts INTEGER')
+            backfill_published_ts(db)
+            db.execute('DROP INDEX IF EXISTS idx_articles_date')
+            db.execute('DROP INDEX IF EXISTS idx_articles_listing')
+            db.execute('DROP INDEX IF EXISTS idx_articles_recent')
+            db.execute('CREATE INDEX IF NOT EXISTS idx_articles_published ON articles(published_ts, id)')
+            db.execute('CREATE INDEX IF NOT EXISTS idx_articles_gs_published ON articles(gs_paper, published_ts, id)')
+            db.execute("PRAGMA user_version = 5")
+            db.commit()
+            logger.info("Database migrated to version 5 schema")
+            version = 5
+
+        if version < 6:
+            # Shared across processes so every worker sees when ingest changed the listings
+            db.execute('''CREATE TABLE IF NOT EXISTS app_meta
+                         (key TEXT PRIMARY KEY,
+                          value INTEGER NOT NULL)''')
+            db.execute("INSERT OR IGNORE INTO app_meta (key, value) VALUES ('ingest_generation', 0)")
+            db.execute("PRAGMA user_version = 6")
+            db.commit()
+            logger.info("Database migrated to version 6 schema")
+            version = 6
+
+        if version < 7:
+            # Near-duplicate detection: MinHash signatures of stored articles, and the
+            # other newspapers' copies folded into each canonical article
+            columns = [row['name'] for row in db.execute('PRAGMA table_info(articles)')]
+            if 'minhash' not in columns:
+                db.execute('ALTER TABLE articles ADD COLUMN minhash BLOB')
+            db.execute('''CREATE TABLE IF NOT EXISTS article_sources
+                         (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                          article_id TEXT NOT NULL,
+                          title TEXT NOT NULL,
+                          newspaper TEXT NOT NULL,
+                          link TEXT NOT NULL UNIQUE,
+                          date TEXT NOT NULL,
+                          FOREIGN KEY(article_id) REFERENCES articles(id) ON DELETE CASCADE)''')
+            db.execute('CREATE INDEX IF NOT EXISTS idx_article_sources_article ON article_sources(article_id)')
+            db.execute("PRAGMA user_version = 7")
+            db.commit()
+            logger.info("Database migrated to version 7 schema")
+            version = 7
+
+        if version < 8:
+            # Model outputs keyed by a hash of the extracted text; each column group
+            # carries the version of the model that produced it
+            db.execute('''CREATE TABLE IF NOT EXISTS derived_cache
+                         (content_hash TEXT PRIMARY KEY,
+                          gs_paper TEXT,
+                          gs_probs BLOB,
+                          classifier_version TEXT,
+                          summary TEXT,
+                          summarizer_version TEXT,
+                          embedding BLOB,
+                          embedder_version TEXT,
+                          updated_ts INTEGER NOT NULL)''')
+            db.execute("PRAGMA user_version = 8")
+            db.commit()
+            logger.info("Database migrated to version 8 schema")
+            version = 8
+
+        if version < 9:
+            # Change feed for delta sync: every insert, update and delete of a synced
+            # table appends its row id under a new seq; deletes are kept as tombstones
+            db.execute('''CREATE TABLE IF NOT EXISTS change_log
+                         (seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                          entity TEXT NOT NULL,
+                          row_id NOT NULL,
+                          user_id INTEGER,
+                          deleted INTEGER NOT NULL DEFAULT 0)''')
+            db.execute('CREATE INDEX IF NOT EXISTS idx_change_log_entity ON change_log(entity, user_id, seq)')
+            for table in CHANGE_LOG_USER_COLUMNS:
+                for event in ('INSERT', 'UPDATE', 'DELETE'):
+                    create_change_log_trigger(db, table, event)
+            db.execute("PRAGMA user_version = 9")
+            db.commit()
+            logger.info("Database migrated to version 9 schema")
+            version = 9
+
+        if version < 10:
+            # Results of applied offline-sync operations, so a retried batch is not applied twice
+            db.execute('''CREATE TABLE IF NOT EXISTS sync_ops
+                         (user_id INTEGER NOT NULL,
+                          op_key TEXT NOT NULL,
+                          result TEXT NOT NULL,
+                          created_ts INTEGER NOT NULL,
+                          PRIMARY KEY (user_id, op_key),
+                          FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE) WITHOUT ROWID''')
+            db.execute("PRAGMA user_version = 10")
+            db.commit()
+            logger.info("Database migrated to version 10 schema")
+            version = 10
+
+        if version < 11:
+            # Retention: old articles nobody bookmarked or noted move here with compressed
+            # content. Freed pages go back to the OS via incremental vacuum, which needs
+            # auto_vacuum set before the tables are laid out, hence the one-time VACUUM.
+            db.execute('''CREATE TABLE IF NOT EXISTS articles_archive
+                         (id TEXT PRIMARY KEY,
+                          title TEXT NOT NULL,
+                          content_z BLOB NOT NULL,
+                          summary TEXT NOT NULL,
+                          date TEXT NOT NULL,
+                          published_ts INTEGER,
+                          gs_paper TEXT NOT NULL,
+                          link TEXT NOT NULL,
+                          newspaper TEXT NOT NULL,
+                          archived_ts INTEGER NOT NULL)''')
+            db.execute('CREATE INDEX IF NOT EXISTS idx_articles_archive_link ON articles_archive(link)')
+            # Retention checks, and the cascades when an article is deleted, look these up by article
+            db.execute('CREATE INDEX IF NOT EXISTS idx_bookmarks_article ON bookmarks(article_id)')
+            db.execute('CREATE INDEX IF NOT EXISTS idx_notes_article ON notes(article_id)')
+            db.execute('CREATE INDEX IF NOT EXISTS idx_derived_cache_updated ON derived_cache(updated_ts)')
+            db.execute('CREATE INDEX IF NOT EXISTS idx_sync_ops_created ON sync_ops(created_ts)')
+            db.execute("PRAGMA user_version = 11")
+            db.commit()
+            if db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                logger.info("Rebuilding database for incremental vacuum, this may take a while")
+                db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                db.execute("VACUUM")
+            logger.info("Database migrated to version 11 schema")
+            version = 11
+
+        if version < 12:
+            # Keyword search: FTS5 indexes over the tables' own rows (external content),
+            # kept in step by triggers. articles has no INTEGER PRIMARY KEY, and a full
+            # VACUUM may renumber its implicit rowid, so it gets a stable integer key.
+            # Updates of columns clients do not sync, like this one, stay out of the change log
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("DROP TRIGGER IF EXISTS articles_update_log")
+            create_change_log_trigger(db, 'articles', 'UPDATE')
+            db.commit()
+            article_columns = [column['name'] for column in db.execute("PRAGMA table_info(articles)")]
+            if 'search_key' not in article_columns:
+                db.execute("ALTER TABLE articles ADD COLUMN search_key INTEGER")
+            while True:
+                rows = db.execute("SELECT id FROM articles WHERE search_key IS NULL LIMIT ?",
+                                  (BACKFILL_BATCH_SIZE,)).fetchall()
+                if not rows:
+                    break
+                db.executemany("UPDATE articles SET search_key = ? WHERE id = ?",
+                               [(faiss_id_for(row['id']), row['id']) for row in rows])
+                db.commit()
+            db.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_articles_search_key ON articles(search_key)")
+            db.commit()
+            for table, key, columns in FTS_TABLES:
+                # Triggers and the initial index in one transaction, so no write falls between them
+                db.execute("BEGIN IMMEDIATE")
+                column_list = ', '.join(columns)
+                new_values = ', '.join(f'NEW.{column}' for column in columns)
+                old_values = ', '.join(f'OLD.{column}' for column in columns)
+                db.execute(f'''CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts
+                               USING fts5({column_list}, content='{table}', content_rowid='{key}',
+                                          tokenize='porter unicode61')''')
+                db.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table}
+                               BEGIN
+                                   INSERT INTO {table}_fts (rowid, {column_list}) VALUES (NEW.{key}, {new_values});
+                               END''')
+                db.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table}
+                               BEGIN
+                                   INSERT INTO {table}_fts ({table}_fts, rowid, {column_list})
+                                   VALUES ('delete', OLD.{key}, {old_values});
+                               END''')
+                db.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {column_list} ON {table}
+                               BEGIN
+                                   INSERT INTO {table}_fts ({table}_fts, rowid, {column_list})
+                                   VALUES ('delete', OLD.{key}, {old_values});
+                                   INSERT INTO {table}_fts (rowid, {column_list}) VALUES (NEW.{key}, {new_values});
+                               END''')
+                db.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+                db.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('optimize')")
+                db.commit()
+                logger.info(f"Indexed {table} for full-text search")
+            db.execute("PRAGMA user_version = 12")
+            db.commit()
+            logger.info("Database migrated to version 12 schema")
+
+BACKFILL_BATCH_SIZE = 500
+
+# Tables whose writes go to change_log, with the column holding the owning user
+CHANGE_LOG_USER_COLUMNS = {'articles': None, 'bookmarks': 'user_id', 'notes': 'user_id'}
+
+def create_change_log_trigger(db, table, event):
+    # Article updates are only logged for the columns clients sync
+    row, deleted = ('OLD', 1) if event == 'DELETE' else ('NEW', 0)
+    user_column = CHANGE_LOG_USER_COLUMNS[table]
+    user_value = f"{row}.{user_column}" if user_column else 'NULL'
+    columns = f" OF {SYNC_COLUMNS[table]}" if event == 'UPDATE' and table == 'articles' else ''
+    db.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_log
+                   AFTER {event}{columns} ON {table}
+                   BEGIN
+                       INSERT INTO change_log (entity, row_id, user_id, deleted)
+                       VALUES ('{table}', {row}.id, {user_value}, {deleted});
+                   END''')
+
+def parse_published(date_text, fallback=None):
+    # Epoch seconds for a feed date string (RFC-822 or ISO 8601)
+    for parse in (parsedate_to_datetime, datetime.fromisoformat):
+        try:
+            parsed = parse(date_text)
+        except (TypeError, ValueError, IndexError):
+            continue
+        if parsed.tzinfo is None:
+            return calendar.timegm(parsed.timetuple())
+        return int(parsed.timestamp())
+    return fallback
+
+def backfill_published_ts(db):
+    filled = 0
+    while True:
+        rows = db.execute('''SELECT rowid, date, strftime('%s', last_updated) AS updated_ts
+                             FROM articles WHERE published_ts IS NULL LIMIT ?''',
+                          (BACKFILL_BATCH_SIZE,)).fetchall()
+        if not rows:
+            break
+        db.executemany('UPDATE articles SET published_ts = ? WHERE rowid = ?', [
+            (parse_published(row['date'], int(row['updated_ts'] or time.time())), row['rowid'])
+            for row in rows
+        ])
+        db.commit()
+        filled += len(rows)
+    if filled:
+        logger.info(f"Backfilled published_ts for {filled} articles")
+
+# Full-text search tables: (table, rowid column, indexed columns)
+FTS_TABLES = (
+    ('articles', 'search_key', ('title', 'summary', 'content')),
+    ('notes', 'id', ('title', 'content')),
+)
+FTS_TABLE_KEYS = {table: key for table, key, _ in FTS_TABLES}
+
+# Classifier inference backend, one of classifier_backends.BACKENDS
+CLASSIFIER_BACKEND = os.environ.get('UPSC_CLASSIFIER_BACKEND', 'torch')
+
+# Version tags stored with memoized model outputs; bump one to recompute only its column
+EMBEDDER_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDER_VERSION = EMBEDDER_MODEL
+SUMMARIZER_VERSION = TEXTRANK_VERSION
 
 # Initialize models
+# Until the background loader finishes these stay None and classification
+# falls back to keywords
+tokenizer, model, embedder = None, None, None
+classifier_version = None
+models_ready = threading.Event()
+
 def init_models():
-    global tokenizer, model, embedder
+    global tokenizer, model, embedder, classifier_version
     try:
-        tokenizer = AutoTokenizer.from_pretrained("gs_classifier")
-        model = AutoModelForSequenceClassification.from_pretrained("gs_classifier")
-        embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-        logger.info("Models loaded successfully")
+        from transformers import AutoTokenizer
+        from sentence_transformers import SentenceTransformer
+
+        loaded_tokenizer = AutoTokenizer.from_pretrained(CLASSIFIER_DIR)
+        backend = CLASSIFIER_BACKEND
+        try:
+            loaded_model = load_classifier_backend(backend)
+        except Exception as e:
+            logger.error(f"Error loading {backend} classifier backend, using torch: {e}")
+            backend = 'torch'
+            loaded_model = load_classifier_backend(backend)
+        classifier_version = classifier_version_tag(backend)
+        # Publish the classifier as a pair so requests never see half of it
+        tokenizer, model = loaded_tokenizer, loaded_model
+        embedder = SentenceTransformer(EMBEDDER_MODEL)
+        logger.info(f"Models loaded successfully (classifier backend: {backend})")
     except Exception as e:
         logger.error(f"Error loading models: {e}")
-        tokenizer, model, embedder = None, None, None
 
-def fetch_full_text(url):
+def host_limit(url):
+    host = urlparse(url).netloc
+    with host_limits_lock:
+        if host not in host_limits:
+            host_limits[host] = threading.BoundedSemaphore(MAX_REQUESTS_PER_HOST)
+        return host_limits[host]
+
+def download_article(entry):
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        # Remove unwanted elements
-        for element in soup(['script', 'style', 'nav', 'footer', 'iframe']):
-            element.decompose()
-            
-        paragraphs = [p.get_text().strip() for p in soup.find_all('p')]
-        return ' '.join(p for p in paragraphs if len(p.split()) > 10)
+        with host_limit(entry["link"]):
+            response = http_session.get(entry["link"], timeout=FETCH_TIMEOUT)
+        return dict(entry, html=response.text)
     except Exception as e:
-        logger.error(f"Error fetching full text from {url}: {e}")
+        logger.error(f"Error fetching full text from {entry['link']}: {e}")
+        return None
+
+def extract_text(html):
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Remove unwanted elements
+    for element in soup(['script', 'style', 'nav', 'footer', 'iframe']):
+        element.decompose()
+
+    paragraphs = [p.get_text().strip() for p in soup.find_all('p')]
+    return ' '.join(p for p in paragraphs if len(p.split()) > 10)
+
+def parse_article(entry):
+    full_text = extract_text(entry["html"])
+    if not full_text or len(full_text.split()) < 50:
         return None
 
-def fetch_rss_articles(feed_url, newspaper):
+    return {
+        "id": entry["id"],
+        "title": entry["title"],
+        "content": full_text,
+        "content_hash": hashlib.sha256(full_text.encode('utf-8')).hexdigest(),
+        "summary": None,
+        "date": entry["date"],
+        "published_ts": entry["published_ts"],
+        "gs_paper": None,
+        "gs_probs": None,
+        "embedding": None,
+        "link": entry["link"],
+        "newspaper": entry["newspaper"],
+        "fresh": {}  # column group -> version tag of outputs computed in this run
+    }
+
+def fetch_feed_entries(feed_url, newspaper):
+    # Returns (entries, validators); the validators are only saved once the
+    # entries are stored, so a failed run fetches the feed in full again
     try:
-        feed = feedparser.parse(feed_url)
-        articles = []
+        # Conditional GET so unchanged feeds cost a 304 instead of a full download
+        headers = {}
+        validators = feed_validators.get(feed_url, {})
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        with host_limit(feed_url):
+            response = http_session.get(feed_url, headers=headers, timeout=FETCH_TIMEOUT)
+
+        if response.status_code == 304:
+            logger.info(f"Feed not modified: {newspaper}")
+            return [], None
+        response.raise_for_status()
+
+        validators = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified')
+        }
+
+        feed = feedparser.parse(response.content)
+        entries = []
         seen_titles = set()  # Track titles to avoid duplicates within the same feed
 
-        for entry in feed.entries[:20]:  # Limit to 20 articles per feed
+        for entry in feed.entries[:MAX_ENTRIES_PER_FEED]:
             title = entry.title.strip()
             if title in seen_titles:
                 logger.debug(f"Skipping duplicate title in feed: {title}")
                 continue
             seen_titles.add(title)
 
-            full_text = fetch_full_text(entry.link)
-            if not full_text or len(full_text.split()) < 50:
-                continue
-                
             pub_date = entry.get('published', datetime.now().isoformat())
+            if entry.get('published_parsed'):
+                published_ts = calendar.timegm(entry.published_parsed)
+            else:
+                published_ts = parse_published(pub_date, int(time.time()))
             
             # Generate a unique ID using title, newspaper, and date
             article_id = hashlib.md5((title + newspaper + pub_date).encode()).hexdigest()
             
-            articles.append({
+            entries.append({
                 "id": article_id,
                 "title": title,
                 "link": entry.link,
-                "text": full_text,
                 "date": pub_date,
-                "newspaper": newspaper
+                "published_ts": published_ts,
+                "newspaper": newspaper,
+                "feed_url": feed_url
             })
 
-        return articles
+        return entries, validators
     except Exception as e:
         logger.error(f"Error parsing RSS feed {feed_url}: {e}")
+        return [], None
+
+def filter_known_entries(db, entries):
+    if not entries:
         return []
 
+    ids = [entry["id"] for entry in entries]
+    links = [entry["link"] for entry in entries]
+    known = db.execute(f'''SELECT id, link FROM articles
+                           WHERE id IN ({','.join('?' * len(ids))})
+                              OR link IN ({','.join('?' * len(links))})''', ids + links).fetchall()
+    known_ids = {row['id'] for row in known}
+    known_links = {row['link'] for row in known}
+    # Links already folded into another article as a near-duplicate
+    known_links.update(row['link'] for row in db.execute(
+        f"SELECT link FROM article_sources WHERE link IN ({','.join('?' * len(links))})", links))
+    # Archived articles are still old news, not new entries
+    for row in db.execute(f'''SELECT id, link FROM articles_archive
+                               WHERE id IN ({','.join('?' * len(ids))})
+                                  OR link IN ({','.join('?' * len(links))})''', ids + links):
+        known_ids.add(row['id'])
+        known_links.add(row['link'])
+    return [entry for entry in entries if entry["id"] not in known_ids and entry["link"] not in known_links]
+
+def fetch_new_entries(db):
+    # Returns the entries not stored yet, and the validators of each feed that answered 200
+    entries = []
+    validators = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(RSS_FEEDS)) as executor:
+        futures = {executor.submit(fetch_feed_entries, feed_url, newspaper): feed_url
+                   for newspaper, feed_url in RSS_FEEDS.items()}
+        for future in concurrent.futures.as_completed(futures):
+            feed_entries, feed_validator = future.result()
+            entries.extend(feed_entries)
+            if feed_validator is not None:
+                validators[futures[future]] = feed_validator
+
+    # Skip articles we already stored before downloading them again
+    new_entries = filter_known_entries(db, entries)
+    logger.info(f"Fetching {len(new_entries)} new of {len(entries)} feed entries")
+    return new_entries, validators
 
+def save_feed_validators(entries, validators, settled):
+    # Conditional GET only for feeds whose every new entry was stored, folded
+    # into a duplicate or rejected as too short; others are fetched in full next run
+    unsettled = {entry["feed_url"] for entry in entries if entry["id"] not in settled}
+    for feed_url, validator in validators.items():
+        if feed_url in unsettled:
+            logger.info(f"Not all entries of {feed_url} were stored, it will be fetched in full next run")
+            feed_validators.pop(feed_url, None)
+        else:
+            feed_validators[feed_url] = validator
 
 def summarize_article(text):
-    if not text or len(text.split()) < 50:
+    try:
+        return summarize(text)
+    except Exception as e:
+        logger.error(f"Summarization error: {e}")
         return text
 
+KEYWORDS_PATH = os.environ.get('UPSC_KEYWORDS_PATH', 'gs_keywords.json')
+
+def load_fallback_classifier():
+    if os.path.exists(KEYWORDS_PATH):
+        try:
+            return KeywordClassifier.from_file(KEYWORDS_PATH)
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Error loading keyword table {KEYWORDS_PATH}, using defaults: {e}")
+    return KeywordClassifier(papers=GS_PAPERS)
+
+fallback_classifier = load_fallback_classifier()
+
+def classify_with_model(texts, batch_size=CLASSIFY_BATCH_SIZE):
+    # Returns a (gs_paper, probs) pair per text, or None while no model is loaded
+    current_tokenizer, current_model = tokenizer, model
+    if current_model is None or current_tokenizer is None:
+        return None
+
+    # Tokenize once without padding so inputs can be bucketed by length;
+    # each batch is then padded only up to its own longest sequence.
+    encodings = current_tokenizer(list(texts), truncation=True, max_length=CLASSIFY_MAX_LENGTH)
+    order = sorted(range(len(texts)), key=lambda i: len(encodings["input_ids"][i]))
+    results = [None] * len(texts)
+
+    for start in range(0, len(order), batch_size):
+        bucket = order[start:start + batch_size]
+        features = [{key: encodings[key][i] for key in encodings.keys()} for i in bucket]
+        inputs = current_tokenizer.pad(features, return_tensors="np")
+        probs = softmax(current_model(dict(inputs)))
+        record_inference('classifier', len(bucket))
+        for i, row in zip(bucket, probs.tolist()):
+            results[i] = (GS_PAPERS[row.index(max(row))], row)
+    return results
+
+def classify_with_keywords(texts):
+    record_inference('keyword_classifier', len(texts))
+    return fallback_classifier.classify(texts)
+
+def classify_articles(texts, batch_size=CLASSIFY_BATCH_SIZE):
+    # Returns a (gs_paper, probs) pair per text, in input order
+    if not texts:
+        return []
+
     try:
-        parser = PlaintextParser.from_string(text, Tokenizer("english"))
-        summarizer = TextRankSummarizer()
-        summary = summarizer(parser.document, 4)
-        return " ".join(str(sentence) for sentence in summary)
+        results = classify_with_model(texts, batch_size)
     except Exception as e:
-        print(f"Summarization error: {e}")
-        return text
+        logger.error(f"Batch classification error, using keyword fallback: {e}")
+        results = None
+    return results if results is not None else classify_with_keywords(texts)
 
 def classify_article(text):
-    if model is None or tokenizer is None:
-        keywords = {
-            "GS1": ["history", "culture", "heritage", "art", "geography", "society"],
-            "GS2": ["governance", "constitution", "polity", "international", "relations", "policy"],
-            "GS3": ["economy", "technology", "environment", "security", "disaster", "development"],
-            "GS4": ["ethics", "integrity", "aptitude", "moral", "values", "attitude"]
-        }
-        text_lower = text.lower()
-        scores = {paper: sum(1 for keyword in kw_list if keyword in text_lower) for paper, kw_list in keywords.items()}
-        return max(scores, key=scores.get)
-    
+    return classify_articles([text])[0][0]
+
+# On-demand inference from request threads goes through micro-batchers, so
+# concurrent callers share a few batched forward passes on one thread instead
+# of each running their own; ingest already batches and calls the models directly
+INFERENCE_MAX_BATCH_SIZE = 32
+INFERENCE_MAX_WAIT = 0.005  # seconds the first request of a batch waits for company
+
+def observe_inference_wait(model_name):
+    return lambda batch_size, waited: INFERENCE_WAIT_SECONDS.observe(waited, model=model_name)
+
+_STAGE_DONE = object()
+
+class StageTimings:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+
+    def add(self, stage, seconds, items=1):
+        INGEST_STAGE_SECONDS.observe(seconds, stage=stage)
+        INGEST_STAGE_ITEMS.inc(items, stage=stage)
+        with self.lock:
+            total_seconds, total_items, calls = self.stages.get(stage, (0.0, 0, 0))
+            self.stages[stage] = (total_seconds + seconds, total_items + items, calls + 1)
+
+    def log(self):
+        for stage, (seconds, items, calls) in self.stages.items():
+            logger.info(f"Ingest stage {stage}: {items} items in {calls} calls, "
+                        f"{seconds:.2f}s busy ({seconds / max(items, 1) * 1000:.1f} ms/item)")
+
+def run_stage(name, func, in_queue, out_queue, workers, timings):
+    # Apply func to each item on `workers` threads; None results are dropped
+    remaining = [workers]
+    remaining_lock = threading.Lock()
+
+    def worker():
+        while True:
+            item = in_queue.get()
+            if item is _STAGE_DONE:
+                in_queue.put(_STAGE_DONE)  # Let sibling workers see it too
+                break
+            start = time.perf_counter()
+            try:
+                result = func(item)
+            except Exception as e:
+                logger.error(f"Ingest stage {name} failed: {e}")
+                result = None
+            timings.add(name, time.perf_counter() - start)
+            if result is not None:
+                out_queue.put(result)
+
+        with remaining_lock:
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                out_queue.put(_STAGE_DONE)
+
+    threads = [threading.Thread(target=worker, name=f"ingest-{name}-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+def run_batch_stage(name, func, in_queue, out_queue, batch_size, timings):
+    # Apply func to lists of up to batch_size items on a single thread
+    def worker():
+        done = False
+        while not done:
+            item = in_queue.get()
+            if item is _STAGE_DONE:
+                break
+            batch = [item]
+            deadline = time.monotonic() + STAGE_BATCH_WAIT
+            while len(batch) < batch_size:
+                try:
+                    item = in_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STAGE_DONE:
+                    done = True
+                    break
+                batch.append(item)
+
+            start = time.perf_counter()
+            try:
+                results = func(batch)
+            except Exception as e:
+                logger.error(f"Ingest stage {name} failed: {e}")
+                results = []
+            timings.add(name, time.perf_counter() - start, len(batch))
+            for result in results:
+                out_queue.put(result)
+        out_queue.put(_STAGE_DONE)
+
+    thread = threading.Thread(target=worker, name=f"ingest-{name}", daemon=True)
+    thread.start()
+    return [thread]
+
+def load_derived_batch(articles):
+    # Reuse memoized model outputs for texts seen before; only columns whose
+    # version tag matches the current model are taken
+    by_hash = {}
+    for article in articles:
+        by_hash.setdefault(article["content_hash"], []).append(article)
+    placeholders = ','.join('?' * len(by_hash))
+    rows = get_db().execute(f'SELECT * FROM derived_cache WHERE content_hash IN ({placeholders})',
+                            list(by_hash)).fetchall()
+
+    current_classifier = classifier_version if model is not None else None
+    hits = 0
+    for row in rows:
+        for article in by_hash[row['content_hash']]:
+            hits += 1
+            if row['summarizer_version'] == SUMMARIZER_VERSION:
+                article["summary"] = row['summary']
+            if current_classifier and row['classifier_version'] == current_classifier:
+                article["gs_paper"] = row['gs_paper']
+                article["gs_probs"] = np.frombuffer(row['gs_probs'], dtype=np.float32).tolist()
+            if row['embedder_version'] == EMBEDDER_VERSION:
+                article["embedding"] = np.frombuffer(row['embedding'], dtype=np.float32)
+    if hits:
+        logger.info(f"Derived cache: {hits} of {len(articles)} articles seen before")
+    return articles
+
+def classify_batch(articles):
+    pending = [article for article in articles if article["gs_paper"] is None]
+    if not pending:
+        return articles
+
+    texts = [article["content"] for article in pending]
+    version = classifier_version
     try:
-        inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
-        with torch.no_grad():
-            logits = model(**inputs).logits
-        return GS_PAPERS[torch.argmax(logits, dim=1).item()]
+        classifications = classify_with_model(texts)
     except Exception as e:
-        logger.error(f"Classification error: {e}")
-        return "GS2"
+        logger.error(f"Batch classification error, using keyword fallback: {e}")
+        classifications = None
+    if classifications is None:
+        # Keyword labels are not memoized so the model reclassifies these once loaded
+        classifications, version = classify_with_keywords(texts), None
 
-def fetch_and_store_articles():
-    results = []
-    news_articles = []
+    for article, (gs_paper, probs) in zip(pending, classifications):
+        article["gs_paper"] = gs_paper
+        article["gs_probs"] = probs
+        if version:
+            article["fresh"]["classifier"] = version
+    return articles
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = {executor.submit(fetch_rss_articles, feed_url, newspaper): newspaper for newspaper, feed_url in RSS_FEEDS.items()}
-        for future in concurrent.futures.as_completed(futures):
-            newspaper = futures[future]
-            articles = future.result()
-            news_articles.extend(articles)
+def embed_batch(articles):
+    pending = [article for article in articles if article["embedding"] is None]
+    embeddings = embed_texts([article["content"] for article in pending]) if pending else None
+    if embeddings is not None:
+        for article, embedding in zip(pending, embeddings):
+            article["embedding"] = embedding
+            article["fresh"]["embedder"] = EMBEDDER_VERSION
+    return articles
 
-    db = get_db()
-    
-    for article in news_articles:
-        # Check if article already exists (using the new ID scheme)
-        existing = db.execute('''SELECT id FROM articles WHERE id = ?''', (article["id"],)).fetchone()
-        if existing:
-            logger.debug(f"Skipping duplicate article: {article['title']}")
+def indexed_embedding(article_id):
+    current_index = index
+    if current_index is None:
+        return None
+    try:
+        return current_index.reconstruct(faiss_id_for(article_id))
+    except RuntimeError:
+        return None
+
+def build_duplicate_index(db):
+    duplicate_index = NearDuplicateIndex(embedding_lookup=indexed_embedding)
+    rows = db.execute('''SELECT id, minhash FROM articles
+                         WHERE published_ts > ? AND minhash IS NOT NULL''',
+                      (int(time.time()) - DEDUP_WINDOW_DAYS * 86400,))
+    for row in rows:
+        duplicate_index.add(row['id'], np.frombuffer(row['minhash'], dtype=np.uint32))
+    return duplicate_index
+
+def dedupe_batch(articles, duplicate_index, duplicates):
+    # Keep the first copy of a story as canonical; later copies only record their source
+    unique = []
+    for article in articles:
+        signature = minhash_signature(article["content"])
+        canonical_id = duplicate_index.find(signature, article.get("embedding"))
+        if canonical_id:
+            logger.info(f"Near-duplicate of {canonical_id}: {article['newspaper']} - {article['title']}")
+            duplicates.append(dict(article, canonical_id=canonical_id))
             continue
-            
-        gs_paper = classify_article(article["text"])
-        summary = summarize_article(article["text"])
-
-        article_data = {
-            "id": article["id"],
-            "title": article["title"],
-            "content": article["text"],
-            "summary": summary,
-            "date": article["date"],
-            "gs_paper": gs_paper,
-            "link": article["link"],
-            "newspaper": article["newspaper"]
-        }
+        article["minhash"] = signature
+        duplicate_index.add(article["id"], signature, article.get("embedding"))
+        unique.append(article)
+    return unique
+
+def write_articles(db, articles):
+    db.executemany('''
+        INSERT INTO articles 
+        (id, title, content, summary, date, published_ts, gs_paper, link, newspaper, minhash, search_key)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (article['id'], article['title'], article['content'], 
+         article['summary'], article['date'], article['published_ts'], article['gs_paper'], 
+         article['link'], article['newspaper'],
+         article['minhash'].tobytes() if article.get('minhash') is not None else None,
+         faiss_id_for(article['id']))
+        for article in articles
+    ])
+    write_derived(db, articles)
+    bump_ingest_generation(db)
+
+def write_derived(db, articles):
+    # Upsert only the column groups computed in this run; the others keep their
+    # cached values and version tags
+    rows = []
+    for article in articles:
+        fresh = article.get("fresh")
+        if not fresh:
+            continue
+        classified = "classifier" in fresh
+        embedded = "embedder" in fresh
+        rows.append((
+            article["content_hash"],
+            article["gs_paper"] if classified else None,
+            np.asarray(article["gs_probs"], dtype=np.float32).tobytes() if classified else None,
+            fresh.get("classifier"),
+            article["summary"] if "summarizer" in fresh else None,
+            fresh.get("summarizer"),
+            np.asarray(article["embedding"], dtype=np.float32).tobytes() if embedded else None,
+            fresh.get("embedder"),
+            int(time.time())
+        ))
+    db.executemany('''
+        INSERT INTO derived_cache
+        (content_hash, gs_paper, gs_probs, classifier_version, summary, summarizer_version,
+         embedding, embedder_version, updated_ts)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(content_hash) DO UPDATE SET
+            gs_paper = CASE WHEN excluded.classifier_version IS NULL THEN gs_paper ELSE excluded.gs_paper END,
+            gs_probs = CASE WHEN excluded.classifier_version IS NULL THEN gs_probs ELSE excluded.gs_probs END,
+            classifier_version = COALESCE(excluded.classifier_version, classifier_version),
+            summary = CASE WHEN excluded.summarizer_version IS NULL THEN summary ELSE excluded.summary END,
+            summarizer_version = COALESCE(excluded.summarizer_version, summarizer_version),
+            embedding = CASE WHEN excluded.embedder_version IS NULL THEN embedding ELSE excluded.embedding END,
+            embedder_version = COALESCE(excluded.embedder_version, embedder_version),
+            updated_ts = excluded.updated_ts
+    ''', rows)
+
+def write_article_sources(db, duplicates):
+    db.executemany('''
+        INSERT OR IGNORE INTO article_sources (article_id, title, newspaper, link, date)
+        SELECT ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM articles WHERE id = ?)
+    ''', [
+        (article['canonical_id'], article['title'], article['newspaper'], article['link'], article['date'],
+         article['canonical_id'])
+        for article in duplicates
+    ])
+    bump_ingest_generation(db)
+
+def store_articles(articles, timings):
+    start = time.perf_counter()
+    try:
+        db_write(write_articles, articles).result()
+    except sqlite3.Error as e:
+        logger.error(f"Error inserting articles: {e}")
+        return 0
+    timings.add("store", time.perf_counter() - start, len(articles))
+
+    start = time.perf_counter()
+    embedded = [article for article in articles if article.get("embedding") is not None]
+    if embedded:
+        add_to_faiss(embedded, np.stack([article["embedding"] for article in embedded]))
+    timings.add("index", time.perf_counter() - start, len(embedded))
+    return len(articles)
 
-        results.append(article_data)
+def summarize_context():
+    context = multiprocessing.get_context(SUMMARIZE_START_METHOD)
+    if SUMMARIZE_START_METHOD == 'forkserver':
+        context.set_forkserver_preload(['summarizer'])
+    return context
 
-    # Insert all new articles in a single transaction
-    if results:
+def fetch_and_store_articles(timings=None):
+    # Fetch, parse, embed, dedupe, summarize and classify run as overlapping stages
+    # connected by bounded queues; the calling thread stores finished batches.
+    # Embedding runs before summarizing and classifying so near-duplicates are
+    # dropped before the expensive stages, and outputs memoized for the same
+    # text are looked up before any model runs.
+    run_start = time.perf_counter()
+    timings = timings or StageTimings()
+    db = get_db()
+
+    start = time.perf_counter()
+    entries, validators = fetch_new_entries(db)
+    timings.add("feeds", time.perf_counter() - start, len(RSS_FEEDS))
+    if not entries:
+        save_feed_validators(entries, validators, set())
+        timings.log()
+        return 0
+
+    download_queue = queue.Queue(PIPELINE_QUEUE_SIZE)
+    parse_queue = queue.Queue(PIPELINE_QUEUE_SIZE)
+    memo_queue = queue.Queue(PIPELINE_QUEUE_SIZE)
+    embed_queue = queue.Queue(PIPELINE_QUEUE_SIZE)
+    dedupe_queue = queue.Queue(PIPELINE_QUEUE_SIZE)
+    summarize_queue = queue.Queue(PIPELINE_QUEUE_SIZE)
+    classify_queue = queue.Queue(PIPELINE_QUEUE_SIZE)
+    store_queue = queue.Queue(PIPELINE_QUEUE_SIZE)
+
+    duplicate_index = build_duplicate_index(db)
+    duplicates = []
+    settled = set()  # entry ids stored, folded into a duplicate or too short to keep
+
+    def parse_entry(entry):
+        article = parse_article(entry)
+        if article is None:
+            settled.add(entry["id"])
+        return article
+
+    def store(articles):
+        count = store_articles(articles, timings)
+        if count:
+            settled.update(article["id"] for article in articles)
+        return count
+
+    def feed_entries():
+        for entry in entries:
+            download_queue.put(entry)
+        download_queue.put(_STAGE_DONE)
+
+    stored = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=SUMMARIZE_WORKERS,
+                                                mp_context=summarize_context()) as summarize_pool:
+        def summarize_batch(articles):
+            pending = [article for article in articles if article["summary"] is None]
+            if pending:
+                record_inference('summarizer', len(pending))
+            summaries = summarize_articles([article["content"] for article in pending], executor=summarize_pool)
+            for article, summary in zip(pending, summaries):
+                if summary is None:
+                    # Shown as is but not memoized, so the text is summarized again when next seen
+                    article["summary"] = excerpt(article["content"])
+                    continue
+                article["summary"] = summary
+                article["fresh"]["summarizer"] = SUMMARIZER_VERSION
+            return articles
+
+        # Start the worker processes and load the summarizer before the pipeline needs them
+        summarize_pool.submit(summarize, "").result()
+
+        threads = [threading.Thread(target=feed_entries, name="ingest-feeder", daemon=True)]
+        threads[0].start()
+        threads += run_stage("download", download_article, download_queue, parse_queue, FETCH_WORKERS, timings)
+        threads += run_stage("parse", parse_entry, parse_queue, memo_queue, PARSE_WORKERS, timings)
+        threads += run_batch_stage("memo", load_derived_batch, memo_queue, embed_queue, EMBED_BATCH_SIZE, timings)
+        threads += run_batch_stage("embed", embed_batch, embed_queue, dedupe_queue, EMBED_BATCH_SIZE, timings)
+        threads += run_batch_stage("dedupe", lambda batch: dedupe_batch(batch, duplicate_index, duplicates),
+                                   dedupe_queue, summarize_queue, EMBED_BATCH_SIZE, timings)
+        threads += run_batch_stage("summarize", summarize_batch, summarize_queue, classify_queue,
+                                   SUMMARIZE_BATCH_SIZE, timings)
+        threads += run_batch_stage("classify", classify_batch, classify_queue, store_queue, CLASSIFY_BATCH_SIZE, timings)
+
+        pending = []
+        while True:
+            article = store_queue.get()
+            if article is _STAGE_DONE:
+                break
+            pending.append(article)
+            if len(pending) >= STORE_BATCH_SIZE:
+                stored += store(pending)
+                pending = []
+        if pending:
+            stored += store(pending)
+
+        for thread in threads:
+            thread.join()
+
+    # Canonical articles from this run are stored by now, so their sources can reference them
+    if duplicates:
         try:
-            db.executemany('''
-                INSERT INTO articles 
-                (id, title, content, summary, date, gs_paper, link, newspaper)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', [
-                (article['id'], article['title'], article['content'], 
-                 article['summary'], article['date'], article['gs_paper'], 
-                 article['link'], article['newspaper'])
-                for article in results
-            ])
-            db.commit()
-            logger.info(f"Inserted {len(results)} new articles")
+            db_write(write_article_sources, duplicates).result()
+            settled.update(article["id"] for article in duplicates)
         except sqlite3.Error as e:
-            logger.error(f"Error inserting articles: {e}")
-            db.rollback()
+            logger.error(f"Error recording duplicate sources: {e}")
+    save_feed_validators(entries, validators, settled)
+
+    timings.log()
+    INGEST_RUN_SECONDS.observe(time.perf_counter() - run_start)
+    INGEST_ARTICLES.inc(stored)
+    INGEST_DUPLICATES.inc(len(duplicates))
+    logger.info(f"Inserted {stored} new articles in {time.perf_counter() - run_start:.2f}s, "
+                f"folded {len(duplicates)} near-duplicates")
+    return stored
+
+def faiss_id_for(article_id):
+    # Stable positive int64 derived from the article's md5 hex id
+    return int(article_id[:15], 16)
 
-    add_to_faiss(results)
-    return len(results)
+def new_faiss_index():
+    import faiss
+    # Embeddings are normalized, so inner product is cosine similarity
+    return faiss.IndexIDMap2(faiss.IndexFlatIP(d))
 
-def add_to_faiss(news_articles):
-    global index, news_db
+def save_faiss_index(faiss_index):
+    global faiss_loaded_mtime
+    import faiss
+    tmp_path = FAISS_INDEX_PATH + '.tmp'
+    faiss.write_index(faiss_index, tmp_path)
+    os.replace(tmp_path, FAISS_INDEX_PATH)
+    faiss_loaded_mtime = os.stat(FAISS_INDEX_PATH).st_mtime_ns
 
-    if index.is_trained is False:
-        index = faiss.IndexFlatIP(d)
+def remove_from_faiss(article_ids):
+    # Returns the number of vectors removed
+    global index
+    import faiss
 
-    for i, article in enumerate(news_articles):
-        if article["content"]:
-            text_embedding = embedder.encode(article["content"], normalize_embeddings=True).reshape(1, -1)
-            index.add(text_embedding)
-            news_db[i] = article
+    with faiss_lock:
+        faiss_ids = [faiss_id for faiss_id in map(faiss_id_for, article_ids) if faiss_id in news_db]
+        if index is None or not faiss_ids:
+            return 0
+        # As in add_to_faiss, the serving index may be memory-mapped
+        updated = faiss.clone_index(index)
+        removed = updated.remove_ids(np.array(faiss_ids, dtype=np.int64))
+        index = updated
+        for faiss_id in faiss_ids:
+            news_db.pop(faiss_id, None)
+        save_faiss_index(updated)
+    logger.info(f"Removed {removed} vectors from FAISS ({index.ntotal} total)")
+    return removed
 
-def get_sample_news(gs_paper=None, page=1, per_page=10):
+def refresh_faiss_index():
+    # Only the scheduler leader ingests; other worker processes reload the
+    # index file once it has been replaced
+    global faiss_checked_at
+    now = time.monotonic()
+    if index is None or now - faiss_checked_at < FAISS_RELOAD_INTERVAL:
+        return
+    faiss_checked_at = now
+    try:
+        mtime = os.stat(FAISS_INDEX_PATH).st_mtime_ns
+    except OSError:
+        return
+    if mtime != faiss_loaded_mtime:
+        try:
+            load_faiss_index()
+        except Exception as e:
+            logger.error(f"Error reloading FAISS index: {e}")
+
+def load_faiss_index():
+    global index, news_db, faiss_loaded_mtime
+    import faiss
+
+    if os.path.exists(FAISS_INDEX_PATH):
+        faiss_loaded_mtime = os.stat(FAISS_INDEX_PATH).st_mtime_ns
+        try:
+            index = faiss.read_index(FAISS_INDEX_PATH, faiss.IO_FLAG_MMAP)
+        except RuntimeError as e:
+            logger.warning(f"Could not memory-map FAISS index, loading into memory: {e}")
+            index = faiss.read_index(FAISS_INDEX_PATH)
+    else:
+        index = new_faiss_index()
+
+    indexed_ids = set(faiss.vector_to_array(index.id_map).tolist())
     db = get_db()
-    
-    query = '''SELECT DISTINCT id, title, content, summary, date, gs_paper, link, newspaper 
-               FROM articles 
-               WHERE datetime(last_updated) > datetime('now', '-3 days')'''
-    params = []
-    
+    news_db = {}
+    for row in db.execute('SELECT id FROM articles'):
+        faiss_id = faiss_id_for(row['id'])
+        if faiss_id in indexed_ids:
+            news_db[faiss_id] = row['id']
+    logger.info(f"FAISS index loaded with {index.ntotal} vectors")
+
+def embed_texts(texts):
+    if embedder is None:
+        return None
+    record_inference('embedder', len(texts))
+    return embedder.encode(texts,
+                           batch_size=EMBED_BATCH_SIZE,
+                           normalize_embeddings=True,
+                           convert_to_numpy=True).astype(np.float32)
+
+def add_to_faiss(news_articles, embeddings=None):
+    global index
+    import faiss
+
+    if embeddings is None:
+        if embedder is None:
+            logger.warning("Embedder not loaded, skipping FAISS indexing")
+            return
+        news_articles = [article for article in news_articles if article["content"]]
+        if not news_articles:
+            return
+        embeddings = embed_texts([article["content"] for article in news_articles])
+
+    keep = [i for i, article in enumerate(news_articles) if faiss_id_for(article["id"]) not in news_db]
+    if not keep:
+        return
+    new_articles = [news_articles[i] for i in keep]
+    embeddings = np.ascontiguousarray(embeddings[keep], dtype=np.float32)
+    ids = np.array([faiss_id_for(article["id"]) for article in new_articles], dtype=np.int64)
+
+    with faiss_lock:
+        # The serving index may be memory-mapped, so add to an in-memory copy and swap it in
+        updated = faiss.clone_index(index) if index is not None else new_faiss_index()
+        updated.add_with_ids(embeddings, ids)
+        index = updated
+        for faiss_id, article in zip(ids.tolist(), new_articles):
+            news_db[faiss_id] = article["id"]
+        save_faiss_index(updated)
+    logger.info(f"Indexed {len(new_articles)} articles in FAISS ({index.ntotal} total)")
+
+SEARCH_MAX_K = 50
+SEARCH_MAX_DAYS = 36500  # keeps the date cutoff well inside SQLite's integer range
+SEARCH_OVERFETCH = 4
+
+def embed_query_batch(queries):
+    if embedder is None:
+        raise RuntimeError("Embedder not loaded")
+    record_inference('query_embedder', len(queries))
+    return list(embedder.encode(queries,
+                                batch_size=INFERENCE_MAX_BATCH_SIZE,
+                                normalize_embeddings=True,
+                                convert_to_numpy=True).astype(np.float32))
+
+query_batcher = MicroBatcher('query_embedder', embed_query_batch, max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+                             max_wait=INFERENCE_MAX_WAIT, on_batch=observe_inference_wait('query_embedder'))
+
+@lru_cache(maxsize=1024)
+def embed_query(query):
+    return query_batcher.submit(query).result()[np.newaxis, :]
+
+def semantic_search(query, k=10, gs_paper=None, days=None):
+    refresh_faiss_index()
+    current_index = index
+    if current_index is None or current_index.ntotal == 0:
+        return []
+
+    # Normalize the query so trivially different strings share a cached embedding
+    query_vector = embed_query(' '.join(query.lower().split()))
+
+    filters = ''
+    filter_params = []
+    if gs_paper:
+        filters += ' AND gs_paper = ?'
+        filter_params.append(gs_paper)
+    if days:
+        filters += ' AND published_ts >= ?'
+        filter_params.append(int(time.time()) - days * 86400)
+
+    # Filters are applied after the ANN step, so over-fetch and widen until k results survive
+    fetch_k = k * SEARCH_OVERFETCH if filters else k
+    db = get_db()
+    while True:
+        fetch_k = min(fetch_k, current_index.ntotal)
+        scores, ids = current_index.search(query_vector, fetch_k)
+        hits = [(news_db[faiss_id], score) for faiss_id, score in zip(ids[0].tolist(), scores[0].tolist())
+                if faiss_id in news_db]
+
+        rows = {}
+        if hits:
+            placeholders = ','.join('?' * len(hits))
+            rows = {row['id']: dict(row) for row in db.execute(
+                f'''SELECT id, title, summary, date, gs_paper, link, newspaper
+                    FROM articles WHERE id IN ({placeholders})''' + filters,
+                [article_id for article_id, _ in hits] + filter_params)}
+
+        results = []
+        for article_id, score in hits:
+            if article_id in rows:
+                results.append(dict(rows[article_id], score=score))
+                if len(results) == k:
+                    break
+
+        if len(results) == k or fetch_k >= current_index.ntotal:
+            return results
+        fetch_k *= SEARCH_OVERFETCH
+
+# Response cache
+RESPONSE_CACHE_SIZE = 512
+RESPONSE_CACHE_TTL = 3600  # seconds; also bounds how long the sliding listing window can lag
+RESPONSE_CACHE_URL = os.environ.get('UPSC_CACHE_URL')  # e.g. redis://localhost:6379/0
+
+class LRUCache:
+    def __init__(self, maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+class RedisCache:
+    # Shared cache for multi-process deployments; values are pickled
+    def __init__(self, url, ttl=RESPONSE_CACHE_TTL, prefix='upsc:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+def create_response_cache():
+    if RESPONSE_CACHE_URL:
+        try:
+            return RedisCache(RESPONSE_CACHE_URL)
+        except ImportError:
+            logger.warning("redis is not installed, falling back to the in-process response cache")
+    return LRUCache()
+
+response_cache = create_response_cache()
+bookmark_cache = create_response_cache()  # user id -> frozenset of bookmarked article ids
+
+def get_ingest_generation():
+    row = get_db().execute("SELECT value FROM app_meta WHERE key = 'ingest_generation'").fetchone()
+    return row['value'] if row else 0
+
+def bump_ingest_generation(db):
+    db.execute("UPDATE app_meta SET value = value + 1 WHERE key = 'ingest_generation'")
+
+def cached_listing(gs_paper=None, cursor=None, before=False, per_page=10, page=1):
+    # Article lists are the same for every user until the next ingest commit;
+    # per-user bookmark state is merged in by the caller.
+    key = f"listing:{gs_paper}:{cursor}:{int(before)}:{per_page}:{page}:{get_ingest_generation()}"
+    news_data = response_cache.get(key)
+    if news_data is None:
+        news_data = get_sample_news(gs_paper=gs_paper, cursor=cursor, before=before, per_page=per_page, page=page)
+        response_cache.set(key, news_data)
+    return news_data
+
+def get_bookmarked_ids(user_id, article_ids):
+    # Subset of article_ids the user has bookmarked, from a per-user set cached
+    # under the latest change-log seq of their bookmarks, so a toggle handled by
+    # any worker process invalidates it
+    db = get_db()
+    version = db.execute(f"SELECT COALESCE(MAX(seq), {CHANGE_LOG_FLOOR_SQL}) FROM change_log "
+                         "WHERE entity = 'bookmarks' AND user_id = ?", (user_id,)).fetchone()[0]
+    key = f"bookmarks:{user_id}:{version}"
+    bookmarked = bookmark_cache.get(key)
+    if bookmarked is None:
+        rows = db.execute('SELECT article_id FROM bookmarks WHERE user_id = ?', (user_id,))
+        bookmarked = frozenset(row['article_id'] for row in rows)
+        bookmark_cache.set(key, bookmarked)
+    return bookmarked.intersection(article_ids)
+
+# Listing queries
+LISTING_WINDOW_DAYS = 3
+LISTING_COLUMNS = 'id, title, summary, date, published_ts, gs_paper, link, newspaper'
+
+def encode_cursor(article):
+    return base64.urlsafe_b64encode(json.dumps([article['published_ts'], article['id']]).encode()).decode()
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        published_ts, article_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        published_ts = int(published_ts)
+    except (ValueError, TypeError, OverflowError):  # e.g. 1e400 decodes to inf
+        return None
+    # Anything SQLite cannot bind as an INTEGER is as invalid as a malformed cursor
+    if not -2**63 <= published_ts < 2**63:
+        return None
+    return published_ts, str(article_id)
+
+def listing_window_start():
+    return int(time.time()) - LISTING_WINDOW_DAYS * 86400
+
+def count_articles(gs_paper=None):
+    key = f"count:{gs_paper}:{get_ingest_generation()}"
+    total = response_cache.get(key)
+    if total is None:
+        query = 'SELECT COUNT(*) FROM articles WHERE published_ts > ?'
+        params = [listing_window_start()]
+        if gs_paper:
+            query += ' AND gs_paper = ?'
+            params.append(gs_paper)
+        total = get_db().execute(query, params).fetchone()[0]
+        response_cache.set(key, total)
+    return total
+
+def get_article(article_id):
+    row = get_db().execute(f'SELECT {LISTING_COLUMNS} FROM articles WHERE id = ?', (article_id,)).fetchone()
+    return dict(row) if row else None
+
+def attach_sources(db, articles):
+    # Other newspapers that carried the same story
+    for article in articles:
+        article['sources'] = []
+    if not articles:
+        return
+    by_id = {article['id']: article for article in articles}
+    rows = db.execute(f'''SELECT article_id, newspaper, link FROM article_sources
+                          WHERE article_id IN ({','.join('?' * len(by_id))})''', list(by_id))
+    for row in rows:
+        by_id[row['article_id']]['sources'].append({'newspaper': row['newspaper'], 'link': row['link']})
+
+def get_sample_news(gs_paper=None, cursor=None, before=False, per_page=10, page=1):
+    # Keyset pagination on (published_ts, id): `cursor` is the edge row of the page we came from,
+    # `before` walks towards newer articles instead of older ones.
+    db = get_db()
+
+    query = f'SELECT {LISTING_COLUMNS} FROM articles WHERE published_ts > ?'
+    params = [listing_window_start()]
+
     if gs_paper:
         query += ' AND gs_paper = ?'
         params.append(gs_paper)
-    
-    query += ' ORDER BY date DESC'
-    
-    count_query = query.replace('SELECT DISTINCT id, title, content, summary, date, gs_paper, link, newspaper', 'SELECT COUNT(DISTINCT id)')
-    if gs_paper:
-        total_articles = db.execute(count_query, params).fetchone()[0]
-    else:
-        total_articles = db.execute(count_query).fetchone()[0]
-    
-    query += ' LIMIT ? OFFSET ?'
-    offset = (page - 1) * per_page
-    params.extend([per_page, offset])
-    
-    if gs_paper:
-        articles = db.execute(query, params).fetchall()
+
+    position = decode_cursor(cursor)
+    if position:
+        query += f" AND (published_ts, id) {'>' if before else '<'} (?, ?)"
+        params.extend(position)
     else:
-        articles = db.execute(query, (per_page, offset)).fetchall()
-    
+        before = False
+
+    direction = 'ASC' if before else 'DESC'
+    query += f' ORDER BY published_ts {direction}, id {direction} LIMIT ?'
+    params.append(per_page + 1)
+
+    articles = [dict(article) for article in db.execute(query, params).fetchall()]
+    has_more = len(articles) > per_page
+    articles = articles[:per_page]
+    if before:
+        articles.reverse()
+
+    attach_sources(db, articles)
+
+    has_newer = has_more if before else position is not None
+    has_older = True if before else has_more
+
+    total_articles = count_articles(gs_paper)
     total_pages = (total_articles + per_page - 1) // per_page
-    
+
     return {
-        'articles': [dict(article) for article in articles],
+        'articles': articles,
         'total_pages': total_pages,
-        'current_page': page,
-        'total_articles': total_articles
+        'current_page': max(page, 1),
+        'total_articles': total_articles,
+        'next_cursor': encode_cursor(articles[-1]) if articles and has_older else None,
+        'prev_cursor': encode_cursor(articles[0]) if articles and has_newer else None
     }
 
 # ... [Rest of the routes remain unchanged] ...
@@ -394,11 +1685,9 @@ def signup():
         
         hashed_password = generate_password_hash(password)
         
-        db = get_db()
         try:
-            db.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
-                      (username, email, hashed_password))
-            db.commit()
+            db_write(lambda db: db.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
+                                           (username, email, hashed_password))).result()
             flash('Account created successfully! Please login.', 'success')
             return redirect(url_for('login'))
         except sqlite3.IntegrityError:
@@ -418,22 +1707,22 @@ def show_latest_news():
         return redirect(url_for('login'))
     
     page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
+    before = request.args.get('dir') == 'prev'
     per_page = 10
     
-    news_data = get_sample_news(page=page, per_page=per_page)
+    news_data = cached_listing(cursor=cursor, before=before, per_page=per_page, page=page)
     results = news_data['articles']
     total_pages = news_data['total_pages']
     
-    db = get_db()
-    bookmarks = db.execute('SELECT article_id FROM bookmarks WHERE user_id = ?', 
-                         (session['user_id'],)).fetchall()
-    
-    bookmarked_ids = [bookmark['article_id'] for bookmark in bookmarks]
+    bookmarked_ids = get_bookmarked_ids(session['user_id'], [article['id'] for article in results])
     
     return render_template('latest_news.html', 
                           results=results, 
-                          current_page=page, 
+                          current_page=news_data['current_page'], 
                           total_pages=total_pages,
+                          next_cursor=news_data['next_cursor'],
+                          prev_cursor=news_data['prev_cursor'],
                           bookmarked_ids=bookmarked_ids)
 
 @app.route('/search_results')
@@ -443,56 +1732,191 @@ def search_results():
     
     gs_paper = request.args.get('gs_paper')
     page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
+    before = request.args.get('dir') == 'prev'
     per_page = 10
     
     if not gs_paper:
         return render_template('search_results.html', error="No GS paper selected", results=None)
     
-    news_data = get_sample_news(gs_paper=gs_paper, page=page, per_page=per_page)
+    news_data = cached_listing(gs_paper=gs_paper, cursor=cursor, before=before, per_page=per_page, page=page)
     results = news_data['articles']
     total_pages = news_data['total_pages']
     
-    db = get_db()
-    bookmarks = db.execute('SELECT article_id FROM bookmarks WHERE user_id = ?', 
-                         (session['user_id'],)).fetchall()
-    
-    bookmarked_ids = [bookmark['article_id'] for bookmark in bookmarks]
+    bookmarked_ids = get_bookmarked_ids(session['user_id'], [article['id'] for article in results])
     
     return render_template('search_results.html', 
                           results=results, 
                           gs_paper=gs_paper, 
-                          current_page=page, 
+                          current_page=news_data['current_page'], 
                           total_pages=total_pages,
+                          next_cursor=news_data['next_cursor'],
+                          prev_cursor=news_data['prev_cursor'],
                           bookmarked_ids=bookmarked_ids)
 
 
+@app.route('/api/search')
+def api_search():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing query'}), 400
+
+    gs_paper = request.args.get('gs_paper') or None
+    if gs_paper and gs_paper not in GS_PAPERS:
+        return jsonify({'error': 'Invalid GS paper'}), 400
+
+    if embedder is None:
+        return jsonify({'error': 'Search is not available yet'}), 503
+
+    k = min(max(request.args.get('k', 10, type=int), 1), SEARCH_MAX_K)
+    days = request.args.get('days', type=int)
+    if days is not None:
+        days = min(max(days, 0), SEARCH_MAX_DAYS)
+
+    results = semantic_search(query, k=k, gs_paper=gs_paper, days=days)
+    return jsonify({'query': query, 'results': results})
+
+# Full-text search
+# User input never reaches FTS5 syntax: each word becomes a quoted term and
+# terms are ANDed. Snippets are marked with control characters, escaped, and
+# only then given <mark> tags, so article text cannot inject HTML.
+FTS_MAX_TERMS = 16
+FTS_SNIPPET_TOKENS = 24
+FTS_MARK_START, FTS_MARK_END = '\x02', '\x03'
+FTS_SEARCHES = {
+    # scope: (table, weights for bm25 by column, snippet column, select list)
+    'articles': ('articles', (10.0, 4.0, 1.0), 2,
+                 'a.id, a.title, a.date, a.published_ts, a.gs_paper, a.link, a.newspaper'),
+    'notes': ('notes', (4.0, 1.0), 1, 'a.id, a.article_id, a.title, a.gs_paper, a.last_updated'),
+}
+
+def fts_match_query(text):
+    terms = re.findall(r'\w+', text or '')[:FTS_MAX_TERMS]
+    return ' '.join(f'"{term}"' for term in terms) or None
+
+def fts_markup(text):
+    return (html.escape(text or '')
+            .replace(FTS_MARK_START, '<mark>')
+            .replace(FTS_MARK_END, '</mark>'))
+
+def parse_day(value):
+    # Epoch seconds at UTC midnight for YYYY-MM-DD, or None
+    try:
+        return calendar.timegm(datetime.strptime(value, '%Y-%m-%d').timetuple())
+    except (TypeError, ValueError):
+        return None
+
+def full_text_search(match, scope='articles', user_id=None, gs_paper=None, start_ts=None, end_ts=None, k=20, offset=0):
+    table, weights, snippet_column, columns = FTS_SEARCHES[scope]
+    filters = ''
+    params = [match]
+    if user_id is not None:
+        filters += ' AND a.user_id = ?'
+        params.append(user_id)
+    if gs_paper:
+        filters += ' AND a.gs_paper = ?'
+        params.append(gs_paper)
+    if start_ts is not None:
+        filters += ' AND a.published_ts >= ?'
+        params.append(start_ts)
+    if end_ts is not None:
+        filters += ' AND a.published_ts < ?'
+        params.append(end_ts)
+
+    rows = get_db().execute(f'''
+        SELECT {columns},
+               highlight({table}_fts, 0, '{FTS_MARK_START}', '{FTS_MARK_END}') AS title_highlight,
+               snippet({table}_fts, {snippet_column}, '{FTS_MARK_START}', '{FTS_MARK_END}', '…',
+                       {FTS_SNIPPET_TOKENS}) AS snippet,
+               bm25({table}_fts, {', '.join(map(str, weights))}) AS score
+        FROM {table}_fts JOIN {table} a ON a.{FTS_TABLE_KEYS[table]} = {table}_fts.rowid
+        WHERE {table}_fts MATCH ?{filters}
+        ORDER BY score
+        LIMIT ? OFFSET ?''', params + [k, offset]).fetchall()
+
+    results = []
+    for row in rows:
+        result = dict(row)
+        result['title_highlight'] = fts_markup(result['title_highlight'])
+        result['snippet'] = fts_markup(result['snippet'])
+        result['score'] = -result['score']  # bm25() is lower-is-better
+        results.append(result)
+    return results
+
+@app.route('/api/fts')
+def api_fts():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+
+    query = request.args.get('q', '').strip()
+    match = fts_match_query(query)
+    if not match:
+        return jsonify({'error': 'Missing query'}), 400
+
+    scope = request.args.get('scope', 'articles')
+    if scope not in FTS_SEARCHES:
+        return jsonify({'error': 'Invalid scope'}), 400
+
+    gs_paper = request.args.get('gs_paper') or None
+    if gs_paper and gs_paper not in GS_PAPERS:
+        return jsonify({'error': 'Invalid GS paper'}), 400
+
+    days = request.args.get('days', type=int)
+    if days is not None:
+        days = min(max(days, 0), SEARCH_MAX_DAYS)
+    start_ts = int(time.time()) - days * 86400 if days else None
+    end_ts = None
+    for name in ('from', 'to'):
+        value = request.args.get(name)
+        if not value:
+            continue
+        day = parse_day(value)
+        if day is None:
+            return jsonify({'error': f'Invalid {name} date, expected YYYY-MM-DD'}), 400
+        if name == 'from':
+            start_ts = max(start_ts or day, day)
+        else:
+            end_ts = day + 86400  # The whole `to` day is included
+    if scope == 'notes' and (start_ts is not None or end_ts is not None):
+        return jsonify({'error': 'Date filters apply to articles only'}), 400
+
+    k = min(max(request.args.get('k', 20, type=int), 1), SEARCH_MAX_K)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+
+    results = full_text_search(match, scope=scope, user_id=session['user_id'] if scope == 'notes' else None,
+                               gs_paper=gs_paper, start_ts=start_ts, end_ts=end_ts, k=k, offset=offset)
+    return jsonify({'query': query, 'scope': scope, 'results': results})
+
+def write_toggle_bookmark(db, user_id, article_id):
+    bookmark = db.execute('SELECT id FROM bookmarks WHERE user_id = ? AND article_id = ?', 
+                        (user_id, article_id)).fetchone()
+    
+    if bookmark:
+        db.execute('DELETE FROM bookmarks WHERE id = ?', (bookmark['id'],))
+        return {'success': True, 'bookmarked': False}
+
+    article = db.execute('SELECT title, gs_paper, summary, link FROM articles WHERE id = ?', (article_id,)).fetchone()
+    
+    if not article:
+        return {'success': False, 'error': 'Article not found'}
+    
+    db.execute(
+        'INSERT INTO bookmarks (user_id, article_id, title, gs_paper, summary, link) VALUES (?, ?, ?, ?, ?, ?)',
+        (user_id, article_id, article['title'], article['gs_paper'], article['summary'], article['link'])
+    )
+    return {'success': True, 'bookmarked': True}
+
 @app.route('/bookmark/<article_id>', methods=['POST'])
 def toggle_bookmark(article_id):
     if 'user_id' not in session:
         return jsonify({'success': False, 'error': 'Not logged in'})
     
     user_id = session['user_id']
-    
-    db = get_db()
-    bookmark = db.execute('SELECT * FROM bookmarks WHERE user_id = ? AND article_id = ?', 
-                        (user_id, article_id)).fetchone()
-    
-    if bookmark:
-        db.execute('DELETE FROM bookmarks WHERE id = ?', (bookmark['id'],))
-        db.commit()
-        return jsonify({'success': True, 'bookmarked': False})
-    else:
-        article = db.execute('SELECT * FROM articles WHERE id = ?', (article_id,)).fetchone()
-        
-        if not article:
-            return jsonify({'success': False, 'error': 'Article not found'})
-        
-        db.execute(
-            'INSERT INTO bookmarks (user_id, article_id, title, gs_paper, summary, link) VALUES (?, ?, ?, ?, ?, ?)',
-            (user_id, article_id, article['title'], article['gs_paper'], article['summary'], article['link'])
-        )
-        db.commit()
-        return jsonify({'success': True, 'bookmarked': True})
+    result = db_write(write_toggle_bookmark, user_id, article_id).result()
+    return jsonify(result)
     
 @app.route('/bookmarks')
 def show_bookmarks():
@@ -509,6 +1933,19 @@ def show_bookmarks():
     
     return render_template('bookmarks.html', bookmarks=bookmarks)
 
+def write_note(db, user_id, article, content):
+    note = db.execute('SELECT id FROM notes WHERE user_id = ? AND article_id = ?', 
+                    (user_id, article['id'])).fetchone()
+    
+    if note:
+        db.execute('UPDATE notes SET content = ?, last_updated = CURRENT_TIMESTAMP WHERE id = ?', 
+                 (content, note['id']))
+    else:
+        db.execute(
+            'INSERT INTO notes (user_id, article_id, title, gs_paper, content) VALUES (?, ?, ?, ?, ?)',
+            (user_id, article['id'], article['title'], article['gs_paper'], content)
+        )
+
 @app.route('/notes/<article_id>', methods=['GET', 'POST'])
 def manage_notes(article_id):
     if 'user_id' not in session:
@@ -516,33 +1953,18 @@ def manage_notes(article_id):
     
     user_id = session['user_id']
     
-    all_news = get_sample_news()
-    article = next((a for a in all_news['articles'] if a['id'] == article_id), None)
+    article = get_article(article_id)
     
     if not article:
         flash('Article not found', 'danger')
         return redirect(url_for('home'))
     
-    db = get_db()
-    
     if request.method == 'POST':
         content = request.form['content']
-        
-        note = db.execute('SELECT * FROM notes WHERE user_id = ? AND article_id = ?', 
-                        (user_id, article_id)).fetchone()
-        
-        if note:
-            db.execute('UPDATE notes SET content = ?, last_updated = CURRENT_TIMESTAMP WHERE id = ?', 
-                     (content, note['id']))
-        else:
-            db.execute(
-                'INSERT INTO notes (user_id, article_id, title, gs_paper, content) VALUES (?, ?, ?, ?, ?)',
-                (user_id, article_id, article['title'], article['gs_paper'], content)
-            )
-        
-        db.commit()
+        db_write(write_note, user_id, article, content).result()
         flash('Notes saved successfully!', 'success')
     
+    db = get_db()
     note = db.execute('SELECT * FROM notes WHERE user_id = ? AND article_id = ?', 
                     (user_id, article_id)).fetchone()
     
@@ -554,139 +1976,370 @@ def show_notes():
         return redirect(url_for('login'))
     
     db = get_db()
-    notes = db.execute('SELECT * FROM notes WHERE user_id = ? ORDER BY last_updated DESC', 
-                     (session['user_id'],)).fetchall()
+    q = request.args.get('q', '').strip()
+    match = fts_match_query(q)
+    if match:
+        notes = db.execute('''SELECT n.* FROM notes_fts JOIN notes n ON n.id = notes_fts.rowid
+                              WHERE notes_fts MATCH ? AND n.user_id = ?
+                              ORDER BY bm25(notes_fts, 4.0, 1.0)''', (match, session['user_id'])).fetchall()
+    elif q:
+        notes = []
+    else:
+        notes = db.execute('SELECT * FROM notes WHERE user_id = ? ORDER BY last_updated DESC',
+                           (session['user_id'],)).fetchall()
     
-    return render_template('my_notes.html', notes=notes)
+    return render_template('my_notes.html', notes=notes, q=q)
 
 @app.route('/notes/delete/<note_id>', methods=['POST'])
 def delete_note(note_id):
     if 'user_id' not in session:
         return jsonify({'success': False, 'error': 'Not logged in'})
     
-    db = get_db()
-    db.execute('DELETE FROM notes WHERE id = ? AND user_id = ?', 
-             (note_id, session['user_id']))
-    db.commit()
+    user_id = session['user_id']
+    db_write(lambda db: db.execute('DELETE FROM notes WHERE id = ? AND user_id = ?', 
+                                   (note_id, user_id))).result()
     
     return jsonify({'success': True})
 
-@app.route('/api/bookmarks')
-def api_bookmarks():
+# Delta sync
+# Clients pass back the cursor from their last response as ?since= and receive
+# only rows changed after it, plus the ids of deleted rows. Cursors carry the
+# user id so a cursor from another account falls back to a full sync. Deltas
+# touching more rows come in pages: `has_more` asks the client to call again
+# with the returned cursor.
+SYNC_ARTICLE_LIMIT = 200  # newest articles sent on a full article sync
+SYNC_PAGE_SIZE = SYNC_ARTICLE_LIMIT  # changed rows per delta response
+SYNC_COLUMNS = {
+    'articles': 'id, title, content, summary, gs_paper, link, date, published_ts',
+    'bookmarks': 'id, user_id, article_id, title, gs_paper, summary, link, date_added',
+    'notes': 'id, user_id, article_id, title, gs_paper, content, last_updated'
+}
+SYNC_CHUNK_SIZE = 500  # ids per IN (...) lookup
+
+def encode_sync_cursor(user_id, seq):
+    return f"{user_id}.{seq}"
+
+def decode_sync_cursor(value, user_id):
+    # Returns the seq, or None when the cursor is missing, malformed or another user's
+    try:
+        cursor_user, seq = (int(part) for part in value.split('.'))
+    except (AttributeError, ValueError):
+        return None
+    return seq if cursor_user == user_id and seq >= 0 else None
+
+# Seq of the newest pruned change; stands in for MAX(seq) once a user's changes are all pruned
+CHANGE_LOG_FLOOR_SQL = "(SELECT COALESCE(MAX(value), 0) FROM app_meta WHERE key = 'change_log_floor')"
+
+def change_log_floor(db):
+    # Changes at or below this seq may have been pruned; older cursors need a full sync
+    row = db.execute("SELECT value FROM app_meta WHERE key = 'change_log_floor'").fetchone()
+    return row['value'] if row else 0
+
+def fetch_sync_rows(db, entity, user_id, ids):
+    rows = []
+    for start in range(0, len(ids), SYNC_CHUNK_SIZE):
+        chunk = ids[start:start + SYNC_CHUNK_SIZE]
+        placeholders = ','.join('?' * len(chunk))
+        query = f'SELECT {SYNC_COLUMNS[entity]} FROM {entity} WHERE id IN ({placeholders})'
+        params = list(chunk)
+        if entity != 'articles':
+            query += ' AND user_id = ?'
+            params.append(user_id)
+        rows.extend(dict(row) for row in db.execute(query, params))
+    return rows
+
+def sync_response(entity):
     if 'user_id' not in session:
         return jsonify({'error': 'Not logged in'}), 401
-    
+
+    user_id = session['user_id']
+    owner = None if entity == 'articles' else user_id
     db = get_db()
-    bookmarks = db.execute('''
-        SELECT b.id, b.article_id, b.title, b.gs_paper, b.summary, b.link, b.date_added 
-        FROM bookmarks b
-        WHERE b.user_id = ?
-    ''', (session['user_id'],)).fetchall()
-    
-    bookmarks_list = []
-    for bookmark in bookmarks:
-        bookmarks_list.append({
-            'id': bookmark['id'],
-            'article_id': bookmark['article_id'],
-            'title': bookmark['title'],
-            'gs_paper': bookmark['gs_paper'],
-            'summary': bookmark['summary'],
-            'link': bookmark['link'],
-            'date_added': bookmark['date_added']
+
+    since = decode_sync_cursor(request.args.get('since'), user_id)
+    if since is not None and since < change_log_floor(db):
+        since = None
+    # Read before the rows so a change racing this request is resent next time, never lost
+    latest = db.execute(f'SELECT COALESCE(MAX(seq), {CHANGE_LOG_FLOOR_SQL}) FROM change_log '
+                        'WHERE entity = ? AND user_id IS ?', (entity, owner)).fetchone()[0]
+    latest = max(latest, since or 0)
+
+    # Every change to the user's rows advances `latest`, so it identifies the response body
+    etag = hashlib.sha1(f"{entity}:{user_id}:{since}:{latest}".encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        cursor, has_more = latest, False
+        if since is None:
+            if entity == 'articles':
+                rows = db.execute(f'''SELECT {SYNC_COLUMNS[entity]} FROM articles
+                                       ORDER BY published_ts DESC, id DESC LIMIT ?''', (SYNC_ARTICLE_LIMIT,))
+            else:
+                rows = db.execute(f'SELECT {SYNC_COLUMNS[entity]} FROM {entity} WHERE user_id = ? ORDER BY id',
+                                  (user_id,))
+            items, deleted = [dict(row) for row in rows], []
+        else:
+            # Only the last change per row matters; the page ends before the change
+            # that would add one row too many, and the cursor at the last change taken
+            state = {}
+            for row in db.execute('''SELECT seq, row_id, deleted FROM change_log
+                                     WHERE entity = ? AND user_id IS ? AND seq > ? AND seq <= ?
+                                     ORDER BY seq''', (entity, owner, since, latest)):
+                if row['row_id'] not in state and len(state) == SYNC_PAGE_SIZE:
+                    has_more = True
+                    break
+                state[row['row_id']] = row['deleted']
+                cursor = row['seq']
+            items = fetch_sync_rows(db, entity, user_id, [row_id for row_id, gone in state.items() if not gone])
+            deleted = [row_id for row_id, gone in state.items() if gone]
+
+        response = jsonify({
+            'cursor': encode_sync_cursor(user_id, cursor),
+            'full': since is None,
+            'has_more': has_more,
+            'items': items,
+            'deleted': deleted
         })
-    
-    return jsonify(bookmarks_list)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
-@app.route('/api/notes')
-def api_notes():
+# Batched offline sync
+SYNC_MAX_OPERATIONS = 200
+
+def write_set_bookmark(db, user_id, article_id, bookmarked):
+    # Sets rather than toggles, so replaying an operation cannot flip it back
+    if not bookmarked:
+        db.execute('DELETE FROM bookmarks WHERE user_id = ? AND article_id = ?', (user_id, article_id))
+        return {'success': True, 'bookmarked': False}
+
+    article = db.execute('SELECT title, gs_paper, summary, link FROM articles WHERE id = ?', (article_id,)).fetchone()
+    if not article:
+        return {'success': False, 'error': 'Article not found'}
+
+    db.execute(
+        '''INSERT OR IGNORE INTO bookmarks (user_id, article_id, title, gs_paper, summary, link)
+           VALUES (?, ?, ?, ?, ?, ?)''',
+        (user_id, article_id, article['title'], article['gs_paper'], article['summary'], article['link'])
+    )
+    return {'success': True, 'bookmarked': True}
+
+# Field types each operation needs; malformed operations fail for good rather than being retried
+SYNC_OPERATION_FIELDS = {
+    'bookmark': {'article_id': str},
+    'removeBookmark': {'article_id': str},
+    'note': {'article_id': str, 'content': str},
+    'deleteNote': {'note_id': int}
+}
+
+def apply_sync_operation(db, user_id, operation):
+    op_type = operation.get('type')
+    fields = SYNC_OPERATION_FIELDS.get(op_type) if isinstance(op_type, str) else None
+    if fields is None:
+        return {'success': False, 'error': f'Unknown operation type: {op_type}'}
+    for field, field_type in fields.items():
+        value = operation.get(field)
+        if not isinstance(value, field_type) or isinstance(value, bool):
+            return {'success': False, 'error': f'Invalid {field}'}
+    if not isinstance(operation.get('bookmarked', True), bool):
+        return {'success': False, 'error': 'Invalid bookmarked'}
+
+    if op_type == 'bookmark':
+        return write_set_bookmark(db, user_id, operation.get('article_id'), operation.get('bookmarked', True))
+    if op_type == 'removeBookmark':
+        return write_set_bookmark(db, user_id, operation.get('article_id'), False)
+    if op_type == 'note':
+        article = db.execute('SELECT id, title, gs_paper FROM articles WHERE id = ?',
+                             (operation.get('article_id'),)).fetchone()
+        if not article:
+            return {'success': False, 'error': 'Article not found'}
+        write_note(db, user_id, article, operation['content'])
+        return {'success': True}
+    if op_type == 'deleteNote':
+        db.execute('DELETE FROM notes WHERE id = ? AND user_id = ?', (operation['note_id'], user_id))
+        return {'success': True}
+
+def write_sync_batch(db, user_id, operations):
+    # Applies the operations in order inside the writer's transaction. Each one
+    # runs in its own savepoint so a database error only fails that operation;
+    # outcomes are recorded under the operation's key and replayed on retry.
+    # Only operational errors (locked, busy, disk) are worth the client retrying.
+    results = []
+    now = int(time.time())
+    for operation in operations:
+        key = str(operation.get('key') or '')
+        if key:
+            row = db.execute('SELECT result FROM sync_ops WHERE user_id = ? AND op_key = ?',
+                             (user_id, key)).fetchone()
+            if row:
+                results.append(dict(json.loads(row['result']), key=key, duplicate=True))
+                continue
+
+        db.execute('SAVEPOINT sync_op')
+        try:
+            result = apply_sync_operation(db, user_id, operation)
+            if key:
+                db.execute('INSERT INTO sync_ops (user_id, op_key, result, created_ts) VALUES (?, ?, ?, ?)',
+                           (user_id, key, json.dumps(result), now))
+            db.execute('RELEASE SAVEPOINT sync_op')
+        except sqlite3.Error as e:
+            db.execute('ROLLBACK TO SAVEPOINT sync_op')
+            db.execute('RELEASE SAVEPOINT sync_op')
+            logger.error(f"Sync operation {key or operation.get('type')} failed: {e}")
+            result = {'success': False, 'error': 'Database error',
+                      'retry': isinstance(e, sqlite3.OperationalError)}
+        results.append(dict(result, key=key))
+    return results
+
+@app.route('/api/sync', methods=['POST'])
+def api_sync():
     if 'user_id' not in session:
         return jsonify({'error': 'Not logged in'}), 401
-    
+
+    payload = request.get_json(silent=True) or {}
+    operations = payload.get('operations')
+    if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+        return jsonify({'error': 'Expected {"operations": [...]}'}), 400
+    if len(operations) > SYNC_MAX_OPERATIONS:
+        return jsonify({'error': f'At most {SYNC_MAX_OPERATIONS} operations per batch'}), 413
+
+    user_id = session['user_id']
+    results = db_write(write_sync_batch, user_id, operations).result() if operations else []
+    return jsonify({'results': results})
+
+@app.route('/api/articles')
+def api_articles():
+    return sync_response('articles')
+
+@app.route('/api/bookmarks')
+def api_bookmarks():
+    return sync_response('bookmarks')
+
+@app.route('/api/notes')
+def api_notes():
+    return sync_response('notes')
+
+# PDF exports
+# Rendered files are cached per user and data version; exports with more rows
+# than EXPORT_BACKGROUND_ROWS are rendered by a background job
+EXPORT_DIR = os.path.join(app.instance_path, 'exports')
+EXPORT_BACKGROUND_ROWS = 200
+EXPORT_WORKERS = 2
+EXPORT_FORMAT_VERSION = 1  # Bump when the PDF layout changes
+EXPORTS = {
+    'bookmarks': {
+        'title': "My UPSC Bookmarked Articles",
+        'filename': 'upsc_bookmarks.pdf',
+        'query': '''SELECT title, gs_paper, summary, link, date_added FROM bookmarks
+                    WHERE user_id = ? ORDER BY date_added DESC''',
+        'flowables': bookmark_flowables
+    },
+    'notes': {
+        'title': "My UPSC Notes",
+        'filename': 'upsc_notes.pdf',
+        'query': '''SELECT title, gs_paper, content, last_updated FROM notes
+                    WHERE user_id = ? ORDER BY last_updated DESC''',
+        'flowables': note_flowables
+    }
+}
+export_executor = concurrent.futures.ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix='export')
+export_jobs = {}  # export path -> Future of the render
+export_jobs_lock = threading.Lock()
+
+def export_path(kind, user_id):
+    # Returns (row count, cache path); the path changes whenever the user's rows do,
+    # as every write to them appends to the change log under a new seq
     db = get_db()
-    notes = db.execute('SELECT * FROM notes WHERE user_id = ?', 
-                     (session['user_id'],)).fetchall()
-    
-    notes_list = []
-    for note in notes:
-        notes_list.append({
-            'id': note['id'],
-            'article_id': note['article_id'],
-            'title': note['title'],
-            'gs_paper': note['gs_paper'],
-            'content': note['content'],
-            'last_updated': note['last_updated']
-        })
-    
-    return jsonify(notes_list)
+    row_count = db.execute(f'SELECT COUNT(*) FROM {kind} WHERE user_id = ?', (user_id,)).fetchone()[0]
+    latest = db.execute(f"SELECT COALESCE(MAX(seq), {CHANGE_LOG_FLOOR_SQL}) FROM change_log "
+                        "WHERE entity = ? AND user_id = ?", (kind, user_id)).fetchone()[0]
+    version = hashlib.sha1(repr((EXPORT_FORMAT_VERSION, latest)).encode()).hexdigest()[:16]
+    return row_count, os.path.join(EXPORT_DIR, f"{kind}_{user_id}_{version}.pdf")
 
-@app.route('/export/bookmarks/pdf')
-def export_bookmarks_pdf():
+def render_export(kind, user_id, path):
+    spec = EXPORTS[kind]
+    start = time.perf_counter()
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=EXPORT_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            # Iterating the cursor directly avoids holding every row twice
+            rows = get_db().execute(spec['query'], (user_id,))
+            render_pdf(f, spec['title'], spec['flowables'](rows))
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+    # Older versions of this user's export are stale now
+    for stale in glob.glob(os.path.join(EXPORT_DIR, f"{kind}_{user_id}_*.pdf")):
+        if stale != path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+    logger.info(f"Rendered {kind} export for user {user_id} in {time.perf_counter() - start:.2f}s")
+    return path
+
+def start_export_job(kind, user_id, path):
+    with export_jobs_lock:
+        job = export_jobs.get(path)
+        if job is None:
+            job = export_executor.submit(render_export, kind, user_id, path)
+            export_jobs[path] = job
+    return job
+
+def send_export(kind, path):
+    return send_file(path, mimetype='application/pdf', as_attachment=True,
+                     download_name=EXPORTS[kind]['filename'])
+
+def export_pdf(kind):
     if 'user_id' not in session:
         return redirect(url_for('login'))
-    
-    db = get_db()
-    bookmarks = db.execute('''
-        SELECT b.id, b.article_id, b.title, b.gs_paper, b.summary, b.link, b.date_added 
-        FROM bookmarks b
-        WHERE b.user_id = ? 
-        ORDER BY b.date_added DESC
-    ''', (session['user_id'],)).fetchall()
-    
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-    story = []
-    
-    story.append(Paragraph("My UPSC Bookmarked Articles", styles['Title']))
-    story.append(Spacer(1, 12))
-    
-    for bookmark in bookmarks:
-        story.append(Paragraph(f"<b>{bookmark['title']}</b>", styles['Heading2']))
-        story.append(Paragraph(f"<b>GS Paper:</b> {bookmark['gs_paper']}", styles['Normal']))
-        story.append(Paragraph(f"<b>Date Bookmarked:</b> {bookmark['date_added']}", styles['Normal']))
-        story.append(Paragraph(bookmark['summary'], styles['Normal']))
-        story.append(Paragraph(f"<b>Link:</b> {bookmark['link']}", styles['Normal']))
-        story.append(Spacer(1, 12))
-    
-    doc.build(story)
-    
-    buffer.seek(0)
-    response = make_response(buffer.getvalue())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = 'attachment; filename=upsc_bookmarks.pdf'
-    return response
+
+    user_id = session['user_id']
+    row_count, path = export_path(kind, user_id)
+    if os.path.exists(path):
+        return send_export(kind, path)
+    if row_count > EXPORT_BACKGROUND_ROWS:
+        start_export_job(kind, user_id, path)
+        return redirect(url_for('export_status', kind=kind))
+
+    render_export(kind, user_id, path)
+    return send_export(kind, path)
+
+@app.route('/export/bookmarks/pdf')
+def export_bookmarks_pdf():
+    return export_pdf('bookmarks')
 
 @app.route('/export/notes/pdf')
 def export_notes_pdf():
+    return export_pdf('notes')
+
+@app.route('/export/<kind>/status')
+def export_status(kind):
     if 'user_id' not in session:
         return redirect(url_for('login'))
-    
-    db = get_db()
-    notes = db.execute('SELECT * FROM notes WHERE user_id = ? ORDER BY last_updated DESC', 
-                     (session['user_id'],)).fetchall()
-    
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-    story = []
-    
-    story.append(Paragraph("My UPSC Notes", styles['Title']))
-    story.append(Spacer(1, 12))
-    
-    for note in notes:
-        story.append(Paragraph(f"<b>{note['title']}</b>", styles['Heading2']))
-        story.append(Paragraph(f"<b>GS Paper:</b> {note['gs_paper']}", styles['Normal']))
-        story.append(Paragraph(f"<b>Last Updated:</b> {note['last_updated']}", styles['Normal']))
-        story.append(Paragraph(note['content'], styles['Normal']))
-        story.append(Spacer(1, 12))
-    
-    doc.build(story)
-    
-    buffer.seek(0)
-    response = make_response(buffer.getvalue())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = 'attachment; filename=upsc_notes.pdf'
-    return response
+    if kind not in EXPORTS:
+        return redirect(url_for('home'))
+
+    row_count, path = export_path(kind, session['user_id'])
+    with export_jobs_lock:
+        job = export_jobs.get(path)
+        if job is not None and job.done():
+            del export_jobs[path]
+
+    error = None
+    if job is not None and job.done() and job.exception() is not None:
+        logger.error(f"Export job failed: {job.exception()}")
+        error = "The export could not be generated. Please try again."
+    elif job is None and not os.path.exists(path):
+        # The data changed since the job started (or it ran in another worker); render the current version
+        start_export_job(kind, session['user_id'], path)
+
+    ready = os.path.exists(path)
+    return render_template('export_status.html', kind=kind, row_count=row_count, ready=ready, error=error,
+                           download_url=url_for(f'export_{kind}_pdf'))
 
 @app.route('/export/single-note/pdf', methods=['POST'])
 def export_single_note_pdf():
@@ -695,28 +2348,208 @@ def export_single_note_pdf():
     
     title = request.form['title']
     content = request.form['content']
-    
+
     buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-    story = []
-    
-    story.append(Paragraph(title, styles['Title']))
-    story.append(Spacer(1, 12))
-    story.append(Paragraph(content, styles['Normal']))
-    
-    doc.build(story)
-    
+    render_pdf(buffer, title, text_flowables(content))
     buffer.seek(0)
-    response = make_response(buffer.getvalue())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'attachment; filename={title.replace(" ", "_")}_notes.pdf'
+    return send_file(buffer, mimetype='application/pdf', as_attachment=True,
+                     download_name=f'{title.replace(" ", "_")}_notes.pdf')
+
+# Request instrumentation
+# With UPSC_PROFILE=1, any request with ?profile=1 returns a profile of itself
+# instead of its normal response (cProfile, or pyinstrument via UPSC_PROFILER)
+PROFILE_REQUESTS = os.environ.get('UPSC_PROFILE', '').lower() in ('1', 'true', 'yes')
+PROFILER = os.environ.get('UPSC_PROFILER', 'cprofile')
+PROFILE_TOP_FUNCTIONS = 60
+profile_lock = threading.Lock()  # The interpreter allows one active profiler at a time
+
+def start_profiler():
+    if not profile_lock.acquire(blocking=False):
+        return None
+    try:
+        if PROFILER == 'pyinstrument':
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+    except Exception as e:
+        profile_lock.release()
+        logger.error(f"Could not start {PROFILER} profiler: {e}")
+        return None
+
+def stop_profiler(profiler):
+    try:
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+        else:
+            profiler.stop()
+    finally:
+        profile_lock.release()
+
+def profile_report(profiler):
+    if isinstance(profiler, cProfile.Profile):
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+        return make_response(output.getvalue(), 200, {'Content-Type': 'text/plain; charset=utf-8'})
+    return make_response(profiler.output_html(), 200, {'Content-Type': 'text/html; charset=utf-8'})
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    if PROFILE_REQUESTS and request.args.get('profile') == '1':
+        g.profiler = start_profiler()
+
+@app.after_request
+def record_request(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        stop_profiler(profiler)
+        response = profile_report(profiler)
+
+    start = g.pop('request_start', None)
+    if start is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=request.endpoint or 'unmatched',
+                                method=request.method, status=response.status_code)
     return response
 
+@app.teardown_request
+def stop_abandoned_profiler(error):
+    # after_request is skipped when a view raises
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        stop_profiler(profiler)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return make_response(render_metrics(METRICS_DIR), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+@app.route('/ready')
+def readiness():
+    status = {
+        'ready': models_ready.is_set(),
+        'classifier': model is not None,
+        'embedder': embedder is not None,
+        'index': index is not None
+    }
+    return jsonify(status), 200 if status['ready'] else 503
+
 @app.route('/offline')
 def offline():
     return render_template('offline.html')
 
+# Retention
+# Articles older than the window that nobody bookmarked or noted are archived
+# with compressed content and dropped from the FAISS index; sync history and
+# cached model outputs are pruned, and the freed pages are returned to the OS.
+RETENTION_DAYS = int(os.environ.get('UPSC_RETENTION_DAYS', 30))
+SYNC_RETENTION_DAYS = int(os.environ.get('UPSC_SYNC_RETENTION_DAYS', 30))  # offline clients older than this resync fully
+RETENTION_BATCH_SIZE = 500
+ARCHIVE_COMPRESSION_LEVEL = 6
+MAINTENANCE_INTERVAL_HOURS = 24
+SQLITE_ANALYSIS_LIMIT = 1000  # rows sampled per index by PRAGMA optimize
+VACUUM_PAGES_PER_STEP = 2000
+
+def database_bytes():
+    return sum(os.path.getsize(path) for path in (DATABASE, DATABASE + '-wal') if os.path.exists(path))
+
+def write_archive_batch(db, cutoff, limit):
+    # Moves up to `limit` expired articles into the archive; returns their ids
+    rows = db.execute('''SELECT id, title, content, summary, date, published_ts, gs_paper, link, newspaper
+                         FROM articles a
+                         WHERE published_ts < ?
+                           AND NOT EXISTS (SELECT 1 FROM bookmarks WHERE article_id = a.id)
+                           AND NOT EXISTS (SELECT 1 FROM notes WHERE article_id = a.id)
+                         ORDER BY published_ts
+                         LIMIT ?''', (cutoff, limit)).fetchall()
+    if not rows:
+        return []
+
+    archived_ts = int(time.time())
+    db.executemany('''
+        INSERT OR REPLACE INTO articles_archive
+        (id, title, content_z, summary, date, published_ts, gs_paper, link, newspaper, archived_ts)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (row['id'], row['title'], zlib.compress(row['content'].encode('utf-8'), ARCHIVE_COMPRESSION_LEVEL),
+         row['summary'], row['date'], row['published_ts'], row['gs_paper'], row['link'], row['newspaper'],
+         archived_ts)
+        for row in rows
+    ])
+    ids = [row['id'] for row in rows]
+    db.executemany('DELETE FROM articles WHERE id = ?', [(article_id,) for article_id in ids])
+    bump_ingest_generation(db)
+    return ids
+
+def write_prune_history(db, now):
+    # change_log has no timestamps, so each run checkpoints its newest seq and a
+    # later run prunes up to that checkpoint once it is SYNC_RETENTION_DAYS old
+    pruned = {}
+    meta = {row['key']: row['value'] for row in db.execute(
+        "SELECT key, value FROM app_meta WHERE key IN ('change_log_checkpoint', 'change_log_checkpoint_ts')")}
+    checkpoint_ts = meta.get('change_log_checkpoint_ts')
+    if checkpoint_ts is not None and checkpoint_ts <= now - SYNC_RETENTION_DAYS * 86400:
+        checkpoint = meta['change_log_checkpoint']
+        pruned['change_log'] = db.execute('DELETE FROM change_log WHERE seq <= ?', (checkpoint,)).rowcount
+        db.execute("INSERT OR REPLACE INTO app_meta (key, value) VALUES ('change_log_floor', ?)", (checkpoint,))
+        checkpoint_ts = None
+    if checkpoint_ts is None:
+        latest = db.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log').fetchone()[0]
+        db.executemany("INSERT OR REPLACE INTO app_meta (key, value) VALUES (?, ?)",
+                       [('change_log_checkpoint', latest), ('change_log_checkpoint_ts', now)])
+
+    pruned['sync_ops'] = db.execute('DELETE FROM sync_ops WHERE created_ts < ?',
+                                    (now - SYNC_RETENTION_DAYS * 86400,)).rowcount
+    pruned['derived_cache'] = db.execute('DELETE FROM derived_cache WHERE updated_ts < ?',
+                                         (now - RETENTION_DAYS * 86400,)).rowcount
+    return pruned
+
+def compact_database(db):
+    # Runs outside the writer thread in short autocommit steps so ingest writes
+    # interleave. executescript because sqlite3's execute frees only one page.
+    free_pages = db.execute('PRAGMA freelist_count').fetchone()[0]
+    while free_pages > 0 and db.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        db.executescript(f'PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP});')
+        remaining = db.execute('PRAGMA freelist_count').fetchone()[0]
+        if remaining >= free_pages:
+            break
+        free_pages = remaining
+    db.executescript(f'PRAGMA analysis_limit = {SQLITE_ANALYSIS_LIMIT}; PRAGMA optimize;')
+    # Fold the WAL back in so the freed pages are truncated from the file
+    db.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+
+def run_maintenance():
+    start = time.perf_counter()
+    bytes_before = database_bytes()
+    now = int(time.time())
+
+    archived_ids = []
+    while True:
+        ids = db_write(write_archive_batch, now - RETENTION_DAYS * 86400, RETENTION_BATCH_SIZE).result()
+        archived_ids.extend(ids)
+        if len(ids) < RETENTION_BATCH_SIZE:
+            break
+    vectors = remove_from_faiss(archived_ids)
+    pruned = db_write(write_prune_history, now).result()
+    compact_database(get_db())
+
+    reclaimed = bytes_before - database_bytes()
+    RETENTION_ARCHIVED.inc(len(archived_ids))
+    RETENTION_RECLAIMED_BYTES.set(reclaimed)
+    logger.info(f"Maintenance archived {len(archived_ids)} articles, removed {vectors} vectors, pruned {pruned}, "
+                f"reclaimed {reclaimed} bytes in {time.perf_counter() - start:.2f}s")
+    return {"archived": len(archived_ids), "vectors_removed": vectors, "pruned": pruned,
+            "bytes_reclaimed": reclaimed, "database_bytes": database_bytes()}
+
+def scheduled_maintenance():
+    with app.app_context():
+        try:
+            run_maintenance()
+        except Exception as e:
+            logger.error(f"Error in scheduled maintenance: {e}")
+
 def scheduled_fetch():
     with app.app_context():
         try:
@@ -725,25 +2558,113 @@ def scheduled_fetch():
         except Exception as e:
             logger.error(f"Error in scheduled fetch: {e}")
 
+def load_models():
+    initialize_nltk()
+    init_models()
+    with app.app_context():
+        try:
+            load_faiss_index()
+        except Exception as e:
+            logger.error(f"Error loading FAISS index: {e}")
+    models_ready.set()
+
+# Scheduler leadership
+# Every serving process competes for this lock; only the holder runs the hourly
+# ingest. The others keep retrying so one takes over if the leader exits.
+SCHEDULER_LOCK_PATH = os.path.join(app.instance_path, 'scheduler.lock')
+LEADER_RETRY_SECONDS = 60
+scheduler = None
+scheduler_lock_file = None
 
-def init_app():
-    init_db()
+def try_lock_file(path):
+    # Returns the open, exclusively locked file, or None if another process holds it
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lock_file = open(path, 'a+')
     try:
-        init_models()
-        count = fetch_and_store_articles()
-        logger.info(f"Initial fetch completed. Added {count} articles")
-    except Exception as e:
-        logger.error(f"Error initializing: {e}")
+        try:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except ImportError:
+            import msvcrt
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
 
-if __name__ == '__main__':
+def become_leader():
+    global scheduler, scheduler_lock_file
+    lock_file = try_lock_file(SCHEDULER_LOCK_PATH)
+    if lock_file is None:
+        return False
+
+    scheduler_lock_file = lock_file
     scheduler = BackgroundScheduler()
     scheduler.add_job(scheduled_fetch, 'interval', hours=1)
+    scheduler.add_job(scheduled_maintenance, 'interval', hours=MAINTENANCE_INTERVAL_HOURS)
     scheduler.start()
-    
-    with app.app_context():
-        init_app()
-    
+    logger.info(f"Process {os.getpid()} is the scheduler leader")
+    return True
+
+def run_leader_election():
+    # Initial ingest runs once the models are up so it does not use the keyword fallback
+    models_ready.wait()
+    while not become_leader():
+        time.sleep(LEADER_RETRY_SECONDS)
+    scheduled_fetch()
+
+def start_worker():
+    # Background work for one serving process; call it after any fork, never
+    # in a pre-fork master, since children would inherit the held lock
+    threading.Thread(target=run_leader_election, name="leader-election", daemon=True).start()
+    if METRICS_DIR:
+        start_snapshots(METRICS_DIR)
+
+def load_in_background():
+    load_models()
+    run_leader_election()
+
+def init_app():
+    init_db()
+    threading.Thread(target=load_in_background, name="model-loader", daemon=True).start()
+
+def reset_after_fork():
+    # Threads, sockets, SQLite connections and possibly-held locks are not
+    # usable in a forked child; give it fresh ones. Models stay shared.
+    global db_local, write_queue, writer_thread, writer_lock, http_session, host_limits, host_limits_lock
+    global faiss_lock, export_executor, export_jobs, export_jobs_lock, profile_lock
+    global response_cache, bookmark_cache, scheduler, scheduler_lock_file
+    db_local = threading.local()
+    write_queue = queue.Queue()
+    writer_thread = None
+    writer_lock = threading.Lock()
+    http_session = create_http_session()
+    host_limits = {}
+    host_limits_lock = threading.Lock()
+    faiss_lock = threading.Lock()
+    export_executor = concurrent.futures.ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix='export')
+    export_jobs = {}
+    export_jobs_lock = threading.Lock()
+    profile_lock = threading.Lock()
+    response_cache = create_response_cache()
+    bookmark_cache = create_response_cache()
+    scheduler, scheduler_lock_file = None, None
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_after_fork)
+
+if __name__ == '__main__':
+    debug = os.environ.get('UPSC_DEBUG', '1') == '1'
+
+    # The debug reloader runs this module in a watcher process and again in the
+    # serving child; only the child (WERKZEUG_RUN_MAIN) loads models and schedules
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        with app.app_context():
+            init_app()
+
     try:
-        app.run(debug=True)
+        app.run(debug=debug)
     except KeyboardInterrupt:
-        scheduler.shutdown()
\ No newline at end of file
+        if scheduler is not None:
+            scheduler.shutdown()
@@ -0,0 +1,87 @@
+"""Compare the NumPy TextRank summarizer with sumy's on stored or scraped article texts."""
+import argparse
+import concurrent.futures
+import csv
+import os
+import sqlite3
+import sys
+import time
+
+from summarizer import LANGUAGE, SUMMARY_SENTENCES, split_sentences, summarize, summarize_articles
+
+
+def load_texts(data_path, limit):
+    """Article contents from the SQLite database or the scraped CSV."""
+    if data_path.endswith('.db'):
+        db = sqlite3.connect(data_path)
+        try:
+            rows = db.execute('SELECT content FROM articles ORDER BY id LIMIT ?', (limit or -1,)).fetchall()
+        finally:
+            db.close()
+        return [row[0] for row in rows if row[0]]
+
+    csv.field_size_limit(sys.maxsize)
+    with open(data_path, newline='', encoding='utf-8') as f:
+        texts = [row["Content"] for row in csv.DictReader(f) if row["Content"]]
+    return texts[:limit] if limit else texts
+
+
+def sumy_summarize(text):
+    """The same TextRank configuration run through sumy's pure-Python implementation."""
+    from sumy.nlp.stemmers import Stemmer
+    from sumy.nlp.tokenizers import Tokenizer
+    from sumy.parsers.plaintext import PlaintextParser
+    from sumy.summarizers.text_rank import TextRankSummarizer
+    from sumy.utils import get_stop_words
+
+    if not text or len(text.split()) < 50:
+        return text
+    summarizer = TextRankSummarizer(Stemmer(LANGUAGE))
+    summarizer.stop_words = get_stop_words(LANGUAGE)
+    document = PlaintextParser.from_string(text, Tokenizer(LANGUAGE)).document
+    return " ".join(str(sentence) for sentence in summarizer(document, SUMMARY_SENTENCES))
+
+
+def timed(func, texts):
+    start = time.perf_counter()
+    results = [func(text) for text in texts]
+    return results, time.perf_counter() - start
+
+
+def sentence_overlap(summary, reference):
+    """Fraction of the reference summary's sentences also picked by the other summary."""
+    picked = set(split_sentences(summary))
+    expected = split_sentences(reference)
+    return sum(sentence in picked for sentence in expected) / max(len(expected), 1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--data", default="upsc_wiki_data5.csv", help="CSV corpus or upsc_news.db")
+    parser.add_argument("--limit", type=int, default=300, help="number of texts (0 for all)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    args = parser.parse_args()
+
+    texts = load_texts(args.data, args.limit)
+    words = sum(len(text.split()) for text in texts)
+    print(f"{len(texts)} texts, {words / max(len(texts), 1):.0f} words on average, from {args.data}")
+
+    summarize(texts[0])  # Load tokenizer data outside the timings
+    sumy_summarize(texts[0])
+
+    reference, sumy_seconds = timed(sumy_summarize, texts)
+    summaries, numpy_seconds = timed(summarize, texts)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers) as pool:
+        summarize_articles(texts[:args.workers], executor=pool)
+        start = time.perf_counter()
+        pooled = summarize_articles(texts, executor=pool)
+        pooled_seconds = time.perf_counter() - start
+
+    identical = sum(a == b for a, b in zip(summaries, reference)) / len(texts)
+    overlap = sum(sentence_overlap(a, b) for a, b in zip(summaries, reference)) / len(texts)
+    for name, seconds in (("sumy", sumy_seconds), ("numpy", numpy_seconds),
+                          (f"numpy x{args.workers} processes", pooled_seconds)):
+        print(f"{name:>22}: {seconds:.2f}s  {seconds / len(texts) * 1000:.1f} ms/article  "
+              f"{sumy_seconds / seconds:.1f}x sumy")
+    print(f"Identical summaries: {identical:.1%}  sentence overlap with sumy: {overlap:.1%}  "
+          f"pool matches serial: {pooled == summaries}")
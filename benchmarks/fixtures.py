@@ -0,0 +1,202 @@
+"""Synthetic and recorded news fixtures, served by a local stand-in for the newspaper sites."""
+import csv
+import hashlib
+import http.server
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from email.utils import formatdate
+from html import escape
+from urllib.parse import urlparse
+
+CORPUS_PATH = "upsc_wiki_data5.csv"
+NEWSPAPERS = ["The Hindu", "Indian Express", "Times of India"]
+SENTENCES_PER_ARTICLE = (12, 30)
+SENTENCES_PER_PARAGRAPH = 4
+
+
+def load_corpus(path=CORPUS_PATH):
+    """(gs_paper, title, sentences) rows from the scraped Wikipedia CSV."""
+    csv.field_size_limit(sys.maxsize)
+    rows = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', row["Content"] or '') if len(s.split()) > 5]
+            if len(sentences) >= 3:
+                rows.append((row["GS Paper"], row["Title"], sentences))
+    return rows
+
+
+def synthetic_articles(corpus, count, seed=0, newest_ts=None, spread_seconds=2 * 86400):
+    """Yield `count` distinct articles mixed from corpus sentences.
+
+    Each article takes its label and opening sentences from one corpus row and
+    fills up with sentences from other rows of the same paper, so repeated
+    passes over the corpus do not produce near-duplicates.
+    """
+    rng = random.Random(seed)
+    by_paper = {}
+    for row in corpus:
+        by_paper.setdefault(row[0], []).append(row)
+    newest_ts = int(newest_ts or time.time())
+
+    for n in range(count):
+        gs_paper, title, sentences = corpus[n % len(corpus)]
+        length = rng.randint(*SENTENCES_PER_ARTICLE)
+        body = sentences[:3]
+        pool = by_paper[gs_paper]
+        while len(body) < length:
+            body.append(rng.choice(rng.choice(pool)[2]))
+
+        published_ts = newest_ts - int(spread_seconds * n / max(count, 1))
+        newspaper = NEWSPAPERS[n % len(NEWSPAPERS)]
+        yield {
+            "n": n,
+            "title": f"{title} ({n})",
+            "sentences": body,
+            "gs_paper": gs_paper,
+            "newspaper": newspaper,
+            "published_ts": published_ts,
+            "date": formatdate(published_ts, usegmt=True),
+        }
+
+
+def article_html(article):
+    paragraphs = [' '.join(article["sentences"][i:i + SENTENCES_PER_PARAGRAPH])
+                  for i in range(0, len(article["sentences"]), SENTENCES_PER_PARAGRAPH)]
+    body = '\n'.join(f"<p>{escape(paragraph)}</p>" for paragraph in paragraphs)
+    return (f"<html><head><title>{escape(article['title'])}</title><script>var ads = 1;</script></head>"
+            f"<body><nav>Home | National</nav><article><h1>{escape(article['title'])}</h1>\n{body}\n</article>"
+            f"<footer>Copyright</footer></body></html>")
+
+
+def rss_xml(newspaper, items):
+    """RSS 2.0 document for (title, link, date) items."""
+    entries = '\n'.join(
+        f"<item><title>{escape(title)}</title><link>{escape(link)}</link><pubDate>{date}</pubDate></item>"
+        for title, link, date in items)
+    return (f'<?xml version="1.0" encoding="UTF-8"?>\n<rss version="2.0"><channel>'
+            f'<title>{escape(newspaper)}</title>\n{entries}\n</channel></rss>')
+
+
+def feed_slug(newspaper):
+    return re.sub(r'\W+', '-', newspaper.lower()).strip('-')
+
+
+class FixtureSite:
+    """In-memory feeds and article pages keyed by URL path."""
+
+    def __init__(self):
+        self.pages = {}
+
+    def add(self, path, body, content_type):
+        self.pages[path] = (body.encode('utf-8') if isinstance(body, str) else body, content_type)
+
+    @classmethod
+    def synthetic(cls, articles, base_url):
+        """One feed per newspaper listing every article, plus the article pages."""
+        site = cls()
+        items = {newspaper: [] for newspaper in NEWSPAPERS}
+        for article in articles:
+            path = f"/articles/{article['n']}.html"
+            site.add(path, article_html(article), 'text/html; charset=utf-8')
+            items[article["newspaper"]].append((article["title"], base_url + path, article["date"]))
+        for newspaper, feed_items in items.items():
+            site.add(f"/feeds/{feed_slug(newspaper)}.xml", rss_xml(newspaper, feed_items), 'application/rss+xml')
+        return site
+
+    @classmethod
+    def recorded(cls, directory, base_url):
+        """Feeds and pages saved by `record`, with article links pointed at this server."""
+        site = cls()
+        with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+        for path, entry in manifest.items():
+            with open(os.path.join(directory, entry["file"]), 'rb') as f:
+                body = f.read()
+            if entry["content_type"].startswith('application/rss'):
+                body = body.replace(b'{{BASE_URL}}', base_url.encode())
+            site.add(path, body, entry["content_type"])
+        return site
+
+    def feeds(self, base_url):
+        """{newspaper: feed url} for app4.RSS_FEEDS."""
+        return {newspaper: f"{base_url}/feeds/{feed_slug(newspaper)}.xml" for newspaper in NEWSPAPERS
+                if f"/feeds/{feed_slug(newspaper)}.xml" in self.pages}
+
+
+class FixtureServer:
+    """Threaded HTTP server on localhost answering from a FixtureSite."""
+
+    def __init__(self, port=0):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                page = server.site.pages.get(urlparse(self.path).path) if server.site else None
+                if page is None:
+                    self.send_error(404)
+                    return
+                body, content_type = page
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.site = None
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="fixture-server", daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def record(directory, feeds, limit):
+    """Save live RSS feeds and up to `limit` linked pages per feed for offline replay."""
+    import requests
+
+    os.makedirs(directory, exist_ok=True)
+    session = requests.Session()
+    session.headers['User-Agent'] = 'Mozilla/5.0 (UPSC Hub benchmark recorder)'
+    manifest = {}
+    for newspaper, feed_url in feeds.items():
+        feed = session.get(feed_url, timeout=15)
+        feed.raise_for_status()
+        xml = feed.content
+        links = re.findall(rb'<link>(?:<!\[CDATA\[)?\s*(https?://[^<\]\s]+)', xml)
+        for link in links[:limit]:
+            name = hashlib.md5(link).hexdigest() + '.html'
+            try:
+                page = session.get(link.decode(), timeout=15)
+                page.raise_for_status()
+            except requests.RequestException as e:
+                print(f"Skipping {link.decode()}: {e}")
+                continue
+            with open(os.path.join(directory, name), 'wb') as f:
+                f.write(page.content)
+            manifest[f"/articles/{name}"] = {"file": name, "content_type": 'text/html; charset=utf-8'}
+            xml = xml.replace(link, b'{{BASE_URL}}/articles/' + name.encode())
+
+        feed_name = feed_slug(newspaper) + '.xml'
+        with open(os.path.join(directory, feed_name), 'wb') as f:
+            f.write(xml)
+        manifest[f"/feeds/{feed_name}"] = {"file": feed_name, "content_type": 'application/rss+xml'}
+        print(f"Recorded {newspaper}: {len(links[:limit])} articles")
+
+    with open(os.path.join(directory, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
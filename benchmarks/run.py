@@ -0,0 +1,277 @@
+"""Offline benchmarks for ingest, listings, exports and model throughput, written as JSON.
+
+Run from the repository root:
+    python -m benchmarks.run --scales 10,100 --output benchmarks/results/baseline.json
+
+Each scale runs in its own process against a fresh SQLite database
+pre-populated with BASE_DB_ARTICLES x scale synthetic articles; ingest fetches
+BASE_INGEST_ARTICLES x scale articles from a local fixture server.
+"""
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.fixtures import CORPUS_PATH, FixtureServer, FixtureSite, load_corpus, record, synthetic_articles
+
+BASE_DB_ARTICLES = 1000
+BASE_INGEST_ARTICLES = 10
+INSERT_BATCH_SIZE = 5000
+DEEP_PAGES = (1, 10, 100, 1000)
+EXPORT_ROWS = 500
+THROUGHPUT_TEXTS = 256
+RESULTS_DIR = os.path.join("benchmarks", "results")
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def throughput(count, seconds):
+    return {"texts": count, "seconds": round(seconds, 4), "texts_per_second": round(count / seconds, 2) if seconds else None}
+
+
+def configure_app(workdir, load_models):
+    """Point app4 at a scratch database, index and export directory."""
+    import app4
+
+    app4.DATABASE = os.path.join(workdir, "bench.db")
+    app4.FAISS_INDEX_PATH = os.path.join(workdir, "bench.faiss")
+    app4.EXPORT_DIR = os.path.join(workdir, "exports")
+    app4.EXPORT_BACKGROUND_ROWS = sys.maxsize  # Time the render inside the request
+    app4.init_db()
+    app4.initialize_nltk()
+    if load_models:
+        app4.init_models()
+        app4.load_faiss_index()
+    return app4
+
+
+def populate(app4, corpus, count):
+    """Insert `count` synthetic articles plus a user with EXPORT_ROWS bookmarks and notes."""
+    db = app4.connect_db()
+    start = time.perf_counter()
+    batch = []
+    for article in synthetic_articles(corpus, count, seed=0):
+        content = ' '.join(article["sentences"])
+        batch.append({
+            "id": hashlib.md5((article["title"] + article["newspaper"] + article["date"]).encode()).hexdigest(),
+            "title": article["title"],
+            "content": content,
+            "summary": ' '.join(article["sentences"][:4]),
+            "date": article["date"],
+            "published_ts": article["published_ts"],
+            "gs_paper": article["gs_paper"],
+            "link": f"https://bench.invalid/{article['n']}",
+            "newspaper": article["newspaper"]
+        })
+        if len(batch) >= INSERT_BATCH_SIZE:
+            with db:
+                app4.write_articles(db, batch)
+            batch = []
+    if batch:
+        with db:
+            app4.write_articles(db, batch)
+    insert_seconds = time.perf_counter() - start
+
+    with db:
+        user_id = db.execute("INSERT INTO users (username, email, password) VALUES ('bench', 'bench@example.invalid', 'x')").lastrowid
+        rows = db.execute('SELECT id, title, gs_paper, summary, link FROM articles ORDER BY published_ts DESC LIMIT ?',
+                          (EXPORT_ROWS,)).fetchall()
+        db.executemany('INSERT INTO bookmarks (user_id, article_id, title, gs_paper, summary, link) VALUES (?, ?, ?, ?, ?, ?)',
+                       [(user_id, row['id'], row['title'], row['gs_paper'], row['summary'], row['link']) for row in rows])
+        db.executemany('INSERT INTO notes (user_id, article_id, title, gs_paper, content) VALUES (?, ?, ?, ?, ?)',
+                       [(user_id, row['id'], row['title'], row['gs_paper'], row['summary']) for row in rows])
+    db.close()
+    return user_id, {"articles": count, "seconds": round(insert_seconds, 3),
+                     "db_bytes": os.path.getsize(app4.DATABASE)}
+
+
+def bench_listing(app4):
+    """Milliseconds for get_sample_news at increasing keyset depths, unfiltered and per paper."""
+    results = {}
+    for gs_paper in (None, "GS2"):
+        app4.response_cache.clear()
+        _, count_seconds = timed(app4.count_articles, gs_paper)
+        cursor, page, at_page = None, 1, {}
+        while page <= max(DEEP_PAGES):
+            listing, seconds = timed(app4.get_sample_news, gs_paper=gs_paper, cursor=cursor, page=page)
+            if page in DEEP_PAGES:
+                at_page[page] = round(seconds * 1000, 3)
+            cursor = listing["next_cursor"]
+            if not cursor:
+                break
+            page += 1
+        results[gs_paper or "all"] = {"count_ms": round(count_seconds * 1000, 3), "pages_walked": page,
+                                      "ms_at_page": at_page}
+    return results
+
+
+def bench_exports(app4, user_id):
+    """Cold (rendered) and cached downloads of both PDF exports."""
+    shutil.rmtree(app4.EXPORT_DIR, ignore_errors=True)
+    client = app4.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['username'] = 'bench'
+
+    results = {}
+    for kind in ("bookmarks", "notes"):
+        results[kind] = {}
+        for attempt in ("cold", "cached"):
+            start = time.perf_counter()
+            response = client.get(f"/export/{kind}/pdf")
+            body = response.get_data()
+            seconds = time.perf_counter() - start
+            response.close()
+            results[kind][attempt] = {"status": response.status_code, "ms": round(seconds * 1000, 2),
+                                      "bytes": len(body)}
+    results["rows"] = EXPORT_ROWS
+    return results
+
+
+def bench_models(app4, corpus):
+    texts = [' '.join(article["sentences"]) for article in synthetic_articles(corpus, THROUGHPUT_TEXTS, seed=7)]
+    results = {}
+
+    _, seconds = timed(app4.classify_articles, texts)
+    results["classify"] = dict(throughput(len(texts), seconds),
+                               backend=app4.CLASSIFIER_BACKEND if app4.model is not None else "keywords")
+
+    _, seconds = timed(app4.summarize_articles, texts)
+    results["summarize"] = throughput(len(texts), seconds)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=app4.SUMMARIZE_WORKERS,
+                                                mp_context=app4.summarize_context()) as pool:
+        app4.summarize_articles(texts[:app4.SUMMARIZE_WORKERS], executor=pool)
+        _, seconds = timed(app4.summarize_articles, texts, executor=pool)
+    results["summarize_pool"] = dict(throughput(len(texts), seconds), workers=app4.SUMMARIZE_WORKERS)
+
+    if app4.embedder is not None:
+        _, seconds = timed(app4.embed_texts, texts)
+        results["embed"] = throughput(len(texts), seconds)
+    else:
+        results["embed"] = {"skipped": "embedder not loaded"}
+    return results
+
+
+def bench_ingest(app4, corpus, volume, fixtures_dir):
+    """End-to-end and per-stage timings of one fetch_and_store_articles run against the fixture server."""
+    with FixtureServer() as server:
+        if fixtures_dir:
+            server.site = FixtureSite.recorded(fixtures_dir, server.base_url)
+        else:
+            server.site = FixtureSite.synthetic(synthetic_articles(corpus, volume, seed=1), server.base_url)
+        app4.RSS_FEEDS = server.site.feeds(server.base_url)
+        app4.MAX_ENTRIES_PER_FEED = max(app4.MAX_ENTRIES_PER_FEED, volume)
+        app4.feed_validators.clear()
+
+        timings = app4.StageTimings()
+        with app4.app.app_context():
+            stored, seconds = timed(app4.fetch_and_store_articles, timings)
+
+    stages = {stage: {"seconds": round(busy, 4), "items": items, "calls": calls,
+                      "ms_per_item": round(busy / max(items, 1) * 1000, 3)}
+              for stage, (busy, items, calls) in timings.stages.items()}
+    return {"entries": volume if not fixtures_dir else None, "stored": stored, "seconds": round(seconds, 3),
+            "articles_per_second": round(stored / seconds, 2) if seconds else None, "stages": stages}
+
+
+def run_scale(scale, args):
+    corpus = load_corpus(args.corpus)
+    workdir = tempfile.mkdtemp(prefix=f"upsc-bench-{scale}x-")
+    try:
+        app4 = configure_app(workdir, args.models)
+        with app4.app.app_context():
+            user_id, population = populate(app4, corpus, BASE_DB_ARTICLES * scale)
+            result = {"population": population, "listing": bench_listing(app4)}
+            result["exports"] = bench_exports(app4, user_id)
+            result["models"] = bench_models(app4, corpus)
+        result["ingest"] = bench_ingest(app4, corpus, BASE_INGEST_ARTICLES * scale, args.fixtures)
+        return result
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            print(f"Kept scratch data in {workdir}")
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline UPSC Hub benchmarks")
+    parser.add_argument("--scales", default="10,100", help="comma-separated volume multipliers, e.g. 10,100,1000")
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--fixtures", help="replay feeds recorded with --record instead of synthetic ones")
+    parser.add_argument("--models", action="store_true", help="load the classifier, embedder and FAISS index")
+    parser.add_argument("--output", help="JSON results path (default benchmarks/results/<commit>-<time>.json)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch databases")
+    parser.add_argument("--record", metavar="DIR", help="record the live RSS feeds and articles into DIR and exit")
+    parser.add_argument("--record-limit", type=int, default=20, help="articles recorded per feed")
+    args = parser.parse_args()
+
+    if args.record:
+        from app4 import RSS_FEEDS
+        record(args.record, RSS_FEEDS, args.record_limit)
+        return
+
+    scales = [int(scale) for scale in args.scales.split(',')]
+    commit, dirty = git_revision()
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{(commit or 'unknown')[:10]}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+
+    if len(scales) == 1:
+        print(f"Running {scales[0]}x benchmarks")
+        results = {str(scales[0]): run_scale(scales[0], args)}
+    else:
+        # Separate processes: app4 keeps one database writer thread per process
+        results = {}
+        for scale in scales:
+            with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+                child_output = f.name
+            command = [sys.executable, "-m", "benchmarks.run", "--scales", str(scale), "--corpus", args.corpus,
+                       "--output", child_output]
+            command += ["--fixtures", args.fixtures] if args.fixtures else []
+            command += ["--models"] if args.models else []
+            command += ["--keep"] if args.keep else []
+            subprocess.run(command, check=True)
+            with open(child_output, encoding="utf-8") as f:
+                results.update(json.load(f)["scales"])
+            os.remove(child_output)
+
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "models_loaded": args.models,
+        "base": {"db_articles": BASE_DB_ARTICLES, "ingest_articles": BASE_INGEST_ARTICLES},
+        "scales": results
+    }
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+
+if __name__ == '__main__':
+    main()
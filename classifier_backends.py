@@ -0,0 +1,60 @@
+"""GS classifier inference backends, shared by the app and export_classifier.py."""
+import os
+
+import numpy as np
+
+# Backends: "torch" (fp32), "torch-int8" (dynamic quantization) or
+# "onnx" (onnxruntime, exported with export_classifier.py)
+BACKENDS = ['torch', 'torch-int8', 'onnx']
+CLASSIFIER_DIR = "gs_classifier"
+CLASSIFIER_ONNX_PATH = os.path.join(CLASSIFIER_DIR, "model.onnx")
+CLASSIFY_BATCH_SIZE = 16
+CLASSIFY_MAX_LENGTH = 512
+
+
+def softmax(logits):
+    shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+
+def load_classifier_backend(name, model_dir=CLASSIFIER_DIR, onnx_path=CLASSIFIER_ONNX_PATH):
+    """Return a callable mapping a dict of int64 numpy arrays to numpy logits."""
+    if name == 'onnx':
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        onnx_session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        input_names = {onnx_input.name for onnx_input in onnx_session.get_inputs()}
+
+        def run_onnx(inputs):
+            feed = {key: value.astype(np.int64) for key, value in inputs.items() if key in input_names}
+            return onnx_session.run(['logits'], feed)[0]
+        return run_onnx
+
+    if name not in ('torch', 'torch-int8'):
+        raise ValueError(f"Unknown classifier backend: {name}")
+
+    import torch
+    from transformers import AutoModelForSequenceClassification
+
+    torch_model = AutoModelForSequenceClassification.from_pretrained(model_dir).eval()
+    if name == 'torch-int8':
+        torch_model = torch.quantization.quantize_dynamic(torch_model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def run_torch(inputs):
+        with torch.inference_mode():
+            tensors = {key: torch.from_numpy(value) for key, value in inputs.items()}
+            return torch_model(**tensors).logits.float().numpy()
+    return run_torch
+
+
+def classifier_version_tag(name):
+    """Backend name plus the newest weights timestamp, so retraining or re-exporting invalidates cached labels."""
+    if name == 'onnx':
+        paths = [CLASSIFIER_ONNX_PATH]
+    else:
+        paths = [os.path.join(CLASSIFIER_DIR, filename) for filename in os.listdir(CLASSIFIER_DIR)
+                 if os.path.join(CLASSIFIER_DIR, filename) != CLASSIFIER_ONNX_PATH]
+    stamp = max((int(os.path.getmtime(path)) for path in paths if os.path.isfile(path)), default=0)
+    return f"{name}:{stamp}"
@@ -0,0 +1,106 @@
+import argparse
+import csv
+import sys
+import time
+
+import numpy as np
+
+from classifier_backends import (BACKENDS, CLASSIFIER_DIR, CLASSIFIER_ONNX_PATH, CLASSIFY_BATCH_SIZE,
+                                 CLASSIFY_MAX_LENGTH, load_classifier_backend, softmax)
+from keyword_classifier import GS_PAPERS
+
+
+def export_onnx(model_dir, output_path):
+    """Export the fine-tuned GS classifier to ONNX with dynamic batch and sequence axes."""
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir).eval()
+    sample = tokenizer(["Sample UPSC article text"], return_tensors="pt")
+    input_names = list(sample.keys())
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+
+    with torch.inference_mode():
+        torch.onnx.export(model, tuple(sample[name] for name in input_names), output_path,
+                          input_names=input_names, output_names=["logits"],
+                          dynamic_axes=dynamic_axes, opset_version=14)
+    print(f"Exported {model_dir} to {output_path} (inputs: {', '.join(input_names)})")
+
+
+def load_corpus(path, limit):
+    """Read (label, text) pairs from the scraped Wikipedia CSV."""
+    csv.field_size_limit(sys.maxsize)
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = [(row["GS Paper"], row["Content"]) for row in csv.DictReader(f) if row["Content"]]
+    return rows[:limit] if limit else rows
+
+
+def run_backend(backend, tokenizer, texts, batch_size):
+    """Return (probs, seconds) for all texts using the given backend callable."""
+    probs = []
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        inputs = tokenizer(texts[i:i + batch_size], truncation=True, max_length=CLASSIFY_MAX_LENGTH,
+                           padding=True, return_tensors="np")
+        probs.append(softmax(backend(dict(inputs))))
+    return np.concatenate(probs), time.perf_counter() - start
+
+
+def verify(model_dir, onnx_path, data_path, limit, batch_size, min_agreement):
+    """Compare every backend against the fp32 torch model on the corpus; False if any disagrees too often
+    or the fp32 model cannot be loaded."""
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    corpus = load_corpus(data_path, limit)
+    labels = np.array([GS_PAPERS.index(label) for label, _ in corpus])
+    texts = [text for _, text in corpus]
+    print(f"Verifying on {len(texts)} articles from {data_path}")
+
+    reference = None
+    passed = True
+    for name in BACKENDS:
+        try:
+            backend = load_classifier_backend(name, model_dir=model_dir, onnx_path=onnx_path)
+        except Exception as e:
+            print(f"{name:>10}: unavailable ({e})")
+            if name == 'torch':
+                # Without the fp32 reference there is nothing to compare against
+                return False
+            continue
+
+        probs, seconds = run_backend(backend, tokenizer, texts, batch_size)
+        predictions = probs.argmax(axis=1)
+        if name == 'torch':
+            reference = probs
+
+        agreement = float((predictions == reference.argmax(axis=1)).mean())
+        max_diff = float(np.abs(probs - reference).max())
+        accuracy = float((predictions == labels).mean())
+        print(f"{name:>10}: agreement {agreement:.4f}  max prob diff {max_diff:.4f}  "
+              f"accuracy {accuracy:.4f}  {seconds / len(texts) * 1000:.1f} ms/article")
+
+        if agreement < min_agreement:
+            print(f"{name:>10}: agreement below {min_agreement}")
+            passed = False
+    return passed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export the GS classifier to ONNX and verify the inference backends")
+    parser.add_argument("--model-dir", default=CLASSIFIER_DIR)
+    parser.add_argument("--output", default=CLASSIFIER_ONNX_PATH)
+    parser.add_argument("--data", default="upsc_wiki_data5.csv")
+    parser.add_argument("--limit", type=int, default=500, help="number of corpus rows to verify on (0 for all)")
+    parser.add_argument("--batch-size", type=int, default=CLASSIFY_BATCH_SIZE)
+    parser.add_argument("--min-agreement", type=float, default=0.98)
+    parser.add_argument("--skip-export", action="store_true", help="only verify an existing ONNX export")
+    args = parser.parse_args()
+
+    if not args.skip_export:
+        export_onnx(args.model_dir, args.output)
+    if not verify(args.model_dir, args.output, args.data, args.limit, args.batch_size, args.min_agreement):
+        sys.exit(1)
@@ -0,0 +1,34 @@
+"""Gunicorn settings for serving UPSC Hub with several worker processes."""
+import os
+import shutil
+
+bind = os.environ.get('UPSC_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('UPSC_WORKERS', 2))
+worker_class = 'gthread'
+threads = int(os.environ.get('UPSC_THREADS', 4))
+timeout = 120
+
+# Import wsgi (and load the models) in the master before forking
+preload_app = True
+
+# Each worker would otherwise start one math thread per core for its inference
+os.environ.setdefault('OMP_NUM_THREADS', str(max(1, (os.cpu_count() or 1) // workers)))
+os.environ.setdefault('UPSC_DEFER_WORKER_START', '1')
+# Workers snapshot their metrics here and /metrics merges them (see metrics.py)
+os.environ.setdefault('UPSC_METRICS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'metrics'))
+
+
+def on_starting(server):
+    # Totals from a previous run would otherwise be added to this one's
+    shutil.rmtree(os.environ['UPSC_METRICS_DIR'], ignore_errors=True)
+
+
+def post_fork(server, worker):
+    import app4
+    app4.start_worker()
+
+
+def worker_exit(server, worker):
+    # Keep the exiting worker's counters in the merged totals
+    from metrics import write_snapshot
+    write_snapshot(os.environ['UPSC_METRICS_DIR'])
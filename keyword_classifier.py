@@ -0,0 +1,118 @@
+import argparse
+import csv
+import json
+import re
+import sys
+
+import numpy as np
+
+GS_PAPERS = ["GS1", "GS2", "GS3", "GS4"]
+
+# Weighted term tables; multi-word terms are matched as phrases
+DEFAULT_TERMS = {
+    "GS1": {"history": 1.0, "culture": 1.0, "heritage": 1.0, "art": 1.0, "geography": 1.0, "society": 1.0,
+            "archaeology": 1.5, "dynasty": 1.5, "freedom struggle": 2.0, "monument": 1.0, "urbanisation": 1.0,
+            "women empowerment": 1.0, "monsoon": 1.0, "earthquake": 0.5},
+    "GS2": {"governance": 1.0, "constitution": 1.0, "polity": 1.0, "international": 1.0, "relations": 1.0,
+            "policy": 1.0, "parliament": 1.5, "supreme court": 1.5, "election commission": 1.5, "bill": 0.5,
+            "ministry": 0.5, "bilateral": 1.5, "fundamental rights": 2.0, "federalism": 1.5},
+    "GS3": {"economy": 1.0, "technology": 1.0, "environment": 1.0, "security": 1.0, "disaster": 1.0,
+            "development": 1.0, "inflation": 1.5, "gdp": 1.5, "agriculture": 1.0, "climate change": 1.5,
+            "cyber": 1.0, "insurgency": 1.5, "infrastructure": 1.0, "biodiversity": 1.5},
+    "GS4": {"ethics": 1.0, "integrity": 1.0, "aptitude": 1.0, "moral": 1.0, "values": 1.0, "attitude": 1.0,
+            "probity": 2.0, "accountability": 1.0, "empathy": 1.5, "conscience": 1.5, "corruption": 1.0},
+}
+DEFAULT_TEMPERATURE = 1.0
+
+
+class KeywordClassifier:
+    """Word-boundary keyword matcher producing per-class scores and softmax confidences."""
+
+    def __init__(self, terms=None, temperature=DEFAULT_TEMPERATURE, papers=GS_PAPERS):
+        terms = terms or DEFAULT_TERMS
+        self.papers = list(papers)
+        self.temperature = temperature
+
+        vocabulary = sorted({term.lower() for paper_terms in terms.values() for term in paper_terms})
+        self.term_index = {term: i for i, term in enumerate(vocabulary)}
+        self.weights = np.zeros((len(vocabulary), len(self.papers)), dtype=np.float32)
+        for paper, paper_terms in terms.items():
+            for term, weight in paper_terms.items():
+                self.weights[self.term_index[term.lower()], self.papers.index(paper)] += weight
+
+        # One alternation for every term; longest first so phrases win over their prefixes
+        alternation = '|'.join(re.escape(term) for term in sorted(vocabulary, key=len, reverse=True))
+        self.pattern = re.compile(rf'\b(?:{alternation})\b', re.IGNORECASE)
+
+    @classmethod
+    def from_file(cls, path):
+        """Load {"temperature": float, "terms": {paper: {term: weight}}} from JSON."""
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+        return cls(terms=config.get("terms"), temperature=config.get("temperature", DEFAULT_TEMPERATURE))
+
+    def save(self, path):
+        terms = {paper: {} for paper in self.papers}
+        for term, i in self.term_index.items():
+            for j, paper in enumerate(self.papers):
+                if self.weights[i, j]:
+                    terms[paper][term] = float(self.weights[i, j])
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"temperature": self.temperature, "terms": terms}, f, indent=2)
+
+    def term_counts(self, texts):
+        counts = np.zeros((len(texts), len(self.term_index)), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for match in self.pattern.finditer(text or ''):
+                counts[row, self.term_index[match.group(0).lower()]] += 1
+        return counts
+
+    def score_batch(self, texts):
+        """Return an (n_texts, n_papers) score matrix; counts are log-scaled so long articles do not dominate."""
+        return np.log1p(self.term_counts(texts)) @ self.weights
+
+    def predict_proba(self, texts, scores=None):
+        scores = self.score_batch(texts) if scores is None else scores
+        logits = scores / self.temperature
+        shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return shifted / shifted.sum(axis=1, keepdims=True)
+
+    def classify(self, texts):
+        """Return a (gs_paper, probs) pair per text; texts with no matches fall back to the first paper."""
+        probs = self.predict_proba(texts)
+        return [(self.papers[int(row.argmax())], row.tolist()) for row in probs]
+
+    def fit_temperature(self, texts, labels, candidates=np.geomspace(0.05, 20, 60)):
+        """Pick the softmax temperature minimising negative log-likelihood on labelled texts."""
+        scores = self.score_batch(texts)
+        targets = np.array([self.papers.index(label) for label in labels])
+        best_nll = None
+        for temperature in candidates:
+            logits = scores / temperature
+            logits = logits - logits.max(axis=1, keepdims=True)
+            log_probs = logits - np.log(np.exp(logits).sum(axis=1, keepdims=True))
+            nll = -log_probs[np.arange(len(targets)), targets].mean()
+            if best_nll is None or nll < best_nll:
+                best_nll, self.temperature = nll, float(temperature)
+        return self.temperature
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Calibrate the keyword fallback classifier on labelled data")
+    parser.add_argument("--data", default="upsc_wiki_data5.csv")
+    parser.add_argument("--terms", help="existing term table to start from")
+    parser.add_argument("--output", default="gs_keywords.json")
+    args = parser.parse_args()
+
+    csv.field_size_limit(sys.maxsize)
+    with open(args.data, newline='', encoding='utf-8') as f:
+        rows = [(row["GS Paper"], row["Content"]) for row in csv.DictReader(f) if row["Content"]]
+
+    classifier = KeywordClassifier.from_file(args.terms) if args.terms else KeywordClassifier()
+    texts = [text for _, text in rows]
+    labels = [label for label, _ in rows]
+    temperature = classifier.fit_temperature(texts, labels)
+    predictions = [paper for paper, _ in classifier.classify(texts)]
+    accuracy = sum(p == label for p, label in zip(predictions, labels)) / len(labels)
+    classifier.save(args.output)
+    print(f"Temperature {temperature:.3f}, accuracy {accuracy:.4f} on {len(labels)} rows; saved to {args.output}")
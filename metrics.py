@@ -0,0 +1,251 @@
+import atexit
+import bisect
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+SNAPSHOT_INTERVAL = 5.0  # seconds between a worker's snapshot writes in multi-process mode
+
+_registry = []
+_registry_lock = threading.Lock()
+_snapshot_path = None
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+        with _registry_lock:
+            _registry.append(self)
+
+    def label_values(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def current(self):
+        """{label values: value} for this process."""
+        with self.lock:
+            return dict(self.values)
+
+    def combine(self, values):
+        """One value from the values several processes reported for a label set."""
+        raise NotImplementedError
+
+    def samples(self, items):
+        """Yield (suffix, label values, extra labels, value) tuples for sorted (label values, value) items."""
+        raise NotImplementedError
+
+    def render(self, items=None):
+        items = sorted(self.current().items()) if items is None else items
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for suffix, values, extra, value in self.samples(items):
+            lines.append(f'{self.name}{suffix}{_format_labels(self.labelnames, values, extra)} {_format_value(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count per label set."""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.label_values(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def combine(self, values):
+        return sum(values)
+
+    def samples(self, items):
+        for values, value in items:
+            yield '_total', values, (), value
+
+
+class Gauge(_Metric):
+    """Current value per label set, either set directly or read from a callback at scrape time.
+
+    The callback returns a single value, or a {label values tuple: value} dict.
+    Across worker processes the live values are combined with `multiprocess_mode`:
+    'max' for process-independent readings such as a file size, 'sum' for
+    per-process amounts such as queue depths.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None, multiprocess_mode='max'):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self.multiprocess_mode = multiprocess_mode
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self.label_values(labels)] = value
+
+    def current(self):
+        if self.callback is None:
+            return super().current()
+        value = self.callback()
+        return value if isinstance(value, dict) else {(): value}
+
+    def combine(self, values):
+        return sum(values) if self.multiprocess_mode == 'sum' else max(values)
+
+    def samples(self, items):
+        for values, value in items:
+            yield '', values, (), value
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count per label set."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self.label_values(labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts, total = self.values.get(key, (None, 0.0))
+            if counts is None:
+                counts = [0] * len(self.buckets)
+            counts[position] += 1
+            self.values[key] = (counts, total + value)
+
+    def current(self):
+        with self.lock:
+            return {key: (list(counts), total) for key, (counts, total) in self.values.items()}
+
+    def combine(self, values):
+        counts = [sum(bucket) for bucket in zip(*(counts for counts, _ in values))]
+        return counts, sum(total for _, total in values)
+
+    def samples(self, items):
+        for values, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield '_bucket', values, (('le', _format_value(bound)),), cumulative
+            yield '_sum', values, (), total
+            yield '_count', values, (), cumulative
+
+
+# Multi-process mode
+# Each worker process writes its values to its own JSON file in a shared
+# directory, every SNAPSHOT_INTERVAL seconds and when it exits; a scrape merges
+# every file. Counters and histograms keep the totals of exited workers (at
+# most one interval is lost if a worker is killed); gauges only count workers
+# whose snapshot is recent.
+
+def write_snapshot(directory):
+    """Atomically write this process's values to its snapshot file in `directory`."""
+    global _snapshot_path
+    if _snapshot_path is None or os.path.dirname(_snapshot_path) != directory:
+        # Start time in the name so a reused pid never overwrites an exited worker's totals
+        _snapshot_path = os.path.join(directory, f"{os.getpid()}-{time.time_ns()}.json")
+    with _registry_lock:
+        metrics = list(_registry)
+    snapshot = {metric.name: [[list(key), value] for key, value in metric.current().items()] for metric in metrics}
+
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, _snapshot_path)
+
+
+def start_snapshots(directory, interval=SNAPSHOT_INTERVAL):
+    """Write snapshots of this process in the background and at exit; call once per worker."""
+    def run():
+        while True:
+            try:
+                write_snapshot(directory)
+            except OSError:
+                pass
+            time.sleep(interval)
+
+    atexit.register(write_snapshot, directory)
+    threading.Thread(target=run, name="metrics-snapshots", daemon=True).start()
+
+
+def _merged_items(directory, interval):
+    per_metric = {}
+    stale_before = time.time() - 3 * interval
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        try:
+            live = os.path.getmtime(path) >= stale_before or path == _snapshot_path
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, entries in snapshot.items():
+            for key, value in entries:
+                per_metric.setdefault(name, {}).setdefault(tuple(key), []).append((live, value))
+
+    merged = {}
+    with _registry_lock:
+        metrics = list(_registry)
+    for metric in metrics:
+        items = []
+        for key, reported in per_metric.get(metric.name, {}).items():
+            values = [value for live, value in reported if live or metric.kind != 'gauge']
+            if values:
+                items.append((key, metric.combine(values)))
+        merged[metric] = sorted(items)
+    return merged
+
+
+def render_metrics(directory=None, interval=SNAPSHOT_INTERVAL):
+    """All registered metrics in the Prometheus text exposition format.
+
+    With a snapshot directory, the values of every worker process writing to it
+    are merged, starting from a fresh snapshot of this one.
+    """
+    merged = None
+    if directory:
+        write_snapshot(directory)
+        merged = _merged_items(directory, interval)
+
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render(merged[metric] if merged is not None else None))
+    return '\n'.join(lines) + '\n'
+
+
+def _reset_after_fork():
+    # A forked child may inherit a lock held by another thread of the parent, and
+    # it starts counting from zero so a parent's values are not reported twice
+    global _registry_lock, _snapshot_path
+    _registry_lock = threading.Lock()
+    _snapshot_path = None
+    for metric in _registry:
+        metric.lock = threading.Lock()
+        metric.values = {}
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,124 @@
+"""Micro-batching for on-demand model calls made from many request threads."""
+import concurrent.futures
+import logging
+import os
+import queue
+import threading
+import time
+import weakref
+
+logger = logging.getLogger(__name__)
+
+_batchers = weakref.WeakSet()
+
+
+class MicroBatcher:
+    """Queue single items from any thread and run them through `func` in batches.
+
+    One worker thread takes the first queued item, then keeps collecting until
+    `max_batch_size` items are waiting or `max_wait` seconds have passed since
+    it arrived, and calls `func(items)`, which must return one result per item.
+    Each `submit` gets a Future for its own result; if `func` raises, every
+    Future of that batch gets the exception.
+    """
+
+    def __init__(self, name, func, max_batch_size=32, max_wait=0.005, on_batch=None):
+        self.name = name
+        self.func = func
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.on_batch = on_batch  # on_batch(batch_size, oldest_wait_seconds), e.g. for metrics
+        self._reset()
+        _batchers.add(self)
+
+    def _reset(self):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    def submit(self, item):
+        future = concurrent.futures.Future()
+        self._ensure_worker()
+        self.queue.put((item, future, time.monotonic()))
+        return future
+
+    def map(self, items):
+        """Results for items in order, blocking until all their batches ran."""
+        futures = [self.submit(item) for item in items]
+        return [future.result() for future in futures]
+
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    def stats(self):
+        with self.lock:
+            batches, items, largest = self.batches, self.items, self.largest_batch
+        return {
+            "queue_depth": self.queue_depth(),
+            "batches": batches,
+            "items": items,
+            "mean_batch_size": round(items / batches, 2) if batches else 0,
+            "largest_batch": largest,
+        }
+
+    def _ensure_worker(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name=f"microbatch-{self.name}", daemon=True)
+                self.thread.start()
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        deadline = batch[0][2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                # Items already queued are taken even once the deadline has passed
+                batch.append(self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Drop items whose caller cancelled the Future while it was queued
+            batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            futures = [future for _, future, _ in batch]
+
+            waited = time.monotonic() - batch[0][2]
+            with self.lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+            if self.on_batch is not None:
+                self.on_batch(len(batch), waited)
+
+            try:
+                results = self.func([item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise ValueError(f"{self.name} returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                logger.error(f"Micro-batch {self.name} failed: {e}")
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+
+def _reset_after_fork():
+    # The worker thread does not survive fork; the child starts its own on first submit
+    for batcher in list(_batchers):
+        batcher._reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
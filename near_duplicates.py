@@ -0,0 +1,91 @@
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 32  # 4 rows per band: candidate pairs start around Jaccard 0.4
+SHINGLE_SIZE = 5
+
+_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.RandomState(20240301)
+_PERM_A = _rng.randint(1, (1 << 31) - 1, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, (1 << 31) - 1, size=NUM_PERM).astype(np.uint64)
+_EMPTY_SIGNATURE = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint32)
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Set of lowercase word n-grams of the text."""
+    words = re.findall(r'\w+', (text or '').lower())
+    if len(words) <= size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash_signature(text):
+    """MinHash signature of the text's shingles as NUM_PERM uint32 values."""
+    hashes = np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles(text)), dtype=np.uint64)
+    if not hashes.size:
+        return _EMPTY_SIGNATURE.copy()
+    # 32-bit hashes times 31-bit coefficients stay below 2**63, so uint64 cannot overflow
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % _PRIME
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def estimate_jaccard(signature, other):
+    return float(np.count_nonzero(signature == other)) / len(signature)
+
+
+class NearDuplicateIndex:
+    """MinHash LSH over article signatures, with candidates confirmed by embedding cosine similarity."""
+
+    def __init__(self, jaccard_threshold=0.3, cosine_threshold=0.9, strict_jaccard_threshold=0.7,
+                 bands=BANDS, embedding_lookup=None):
+        self.jaccard_threshold = jaccard_threshold
+        self.cosine_threshold = cosine_threshold
+        # Used instead of the cosine check when either side has no embedding
+        self.strict_jaccard_threshold = strict_jaccard_threshold
+        self.rows = NUM_PERM // bands
+        self.bands = bands
+        self.embedding_lookup = embedding_lookup
+        self.buckets = defaultdict(set)
+        self.signatures = {}
+        self.embeddings = {}
+
+    def band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def add(self, key, signature, embedding=None):
+        self.signatures[key] = signature
+        if embedding is not None:
+            self.embeddings[key] = embedding
+        for band_key in self.band_keys(signature):
+            self.buckets[band_key].add(key)
+
+    def embedding_for(self, key):
+        embedding = self.embeddings.get(key)
+        if embedding is None and self.embedding_lookup is not None:
+            embedding = self.embedding_lookup(key)
+        return embedding
+
+    def find(self, signature, embedding=None):
+        """Key of the closest confirmed near-duplicate, or None."""
+        candidates = set()
+        for band_key in self.band_keys(signature):
+            candidates.update(self.buckets.get(band_key, ()))
+
+        best_key, best_similarity = None, 0.0
+        for key in candidates:
+            similarity = estimate_jaccard(signature, self.signatures[key])
+            if similarity < self.jaccard_threshold:
+                continue
+            other = self.embedding_for(key) if embedding is not None else None
+            if other is not None:
+                if float(np.dot(embedding, other)) < self.cosine_threshold:
+                    continue
+            elif similarity < self.strict_jaccard_threshold:
+                continue
+            if similarity > best_similarity:
+                best_key, best_similarity = key, similarity
+        return best_key
@@ -0,0 +1,83 @@
+import functools
+import itertools
+from xml.sax.saxutils import escape
+
+STORY_WINDOW = 256  # flowables held ahead of the layout engine while rendering
+
+
+@functools.lru_cache(maxsize=None)
+def export_styles():
+    """ReportLab paragraph styles, built once per process."""
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    styles = getSampleStyleSheet()
+    return {name: styles[name] for name in ('Title', 'Heading2', 'Normal')}
+
+
+def markup(text):
+    """Escape user text for Paragraph markup, keeping line breaks."""
+    return escape(str(text or '')).replace('\n', '<br/>')
+
+
+def bookmark_flowables(rows):
+    from reportlab.platypus import Paragraph, Spacer
+
+    styles = export_styles()
+    for row in rows:
+        yield Paragraph(f"<b>{markup(row['title'])}</b>", styles['Heading2'])
+        yield Paragraph(f"<b>GS Paper:</b> {markup(row['gs_paper'])}", styles['Normal'])
+        yield Paragraph(f"<b>Date Bookmarked:</b> {markup(row['date_added'])}", styles['Normal'])
+        yield Paragraph(markup(row['summary']), styles['Normal'])
+        yield Paragraph(f"<b>Link:</b> {markup(row['link'])}", styles['Normal'])
+        yield Spacer(1, 12)
+
+
+def note_flowables(rows):
+    from reportlab.platypus import Paragraph, Spacer
+
+    styles = export_styles()
+    for row in rows:
+        yield Paragraph(f"<b>{markup(row['title'])}</b>", styles['Heading2'])
+        yield Paragraph(f"<b>GS Paper:</b> {markup(row['gs_paper'])}", styles['Normal'])
+        yield Paragraph(f"<b>Last Updated:</b> {markup(row['last_updated'])}", styles['Normal'])
+        yield Paragraph(markup(row['content']), styles['Normal'])
+        yield Spacer(1, 12)
+
+
+def text_flowables(text):
+    from reportlab.platypus import Paragraph
+
+    yield Paragraph(markup(text), export_styles()['Normal'])
+
+
+class StoryStream(list):
+    """Story list refilled from an iterator as the layout engine consumes it.
+
+    DocTemplate.build only asks for len() and works at the front of the list, so
+    keeping STORY_WINDOW flowables queued bounds the flowables (and cursor rows)
+    in memory. The finished pages still accumulate in the PDF canvas until save.
+    """
+
+    def __init__(self, head, flowables, window=STORY_WINDOW):
+        super().__init__(head)
+        self.source = iter(flowables)
+        self.window = window
+
+    def __len__(self):
+        size = super().__len__()
+        if self.source is not None and size < self.window:
+            chunk = list(itertools.islice(self.source, self.window - size))
+            if len(chunk) < self.window - size:
+                self.source = None
+            self.extend(chunk)
+            size += len(chunk)
+        return size
+
+
+def render_pdf(target, title, flowables):
+    """Render a titled document to a path or binary file object."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+
+    story = StoryStream([Paragraph(markup(title), export_styles()['Title']), Spacer(1, 12)], flowables)
+    SimpleDocTemplate(target, pagesize=letter).build(story)
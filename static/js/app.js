@@ -29,27 +29,37 @@ document.addEventListener('DOMContentLoaded', function() {
 
 // Cache articles with their summaries
 function cacheArticlesWithSummaries() {
-  fetch('/api/articles')
-    .then(response => response.json())
-    .then(articles => {
-      if (window.idbPromise) {
-        // Store articles in IndexedDB for offline access
-        articles.forEach(article => {
-          idbPromise.add('articles', {
-            id: article.id,
-            title: article.title,
-            content: article.content,
-            summary: article.summary,
-            gs_paper: article.gs_paper,
-            link: article.link,
-            date: article.date
-          });
-        });
-      }
-    })
+  return pullChanges('articles')
     .catch(error => console.error('Error caching articles:', error));
 }
 
+// Fetch rows changed since the last sync and apply them to the matching
+// IndexedDB store, following pages until the server has no more. Unchanged
+// collections come back as 304s from the server.
+function pullChanges(entity) {
+  if (!window.idbPromise) return Promise.resolve();
+  
+  const cursorKey = `syncCursor:${entity}`;
+  const cursor = localStorage.getItem(cursorKey);
+  const url = cursor ? `/api/${entity}?since=${encodeURIComponent(cursor)}` : `/api/${entity}`;
+  
+  return fetch(url, { credentials: 'same-origin' })
+    .then(response => {
+      if (response.status === 401) return null; // Logged out; nothing to sync
+      if (!response.ok) throw new Error(`Sync of ${entity} failed with status ${response.status}`);
+      return response.json();
+    })
+    .then(delta => {
+      if (!delta) return;
+      const applied = delta.full
+        ? idbPromise.replaceAll(entity, delta.items)
+        : idbPromise.applyChanges(entity, delta.items, delta.deleted);
+      return applied
+        .then(() => localStorage.setItem(cursorKey, delta.cursor))
+        .then(() => delta.has_more ? pullChanges(entity) : undefined);
+    });
+}
+
 // Setup offline detection and indicator
 function setupOfflineDetection() {
   const offlineIndicator = document.createElement('div');
@@ -96,79 +106,65 @@ function initDarkMode() {
 function syncData() {
   if (!navigator.onLine || !window.idbPromise) return;
   
-  // Get pending operations from sync queue
+  // Push pending offline operations first so the pull below reflects them
   idbPromise.getSyncQueue()
-    .then(operations => {
-      if (operations.length === 0) return;
-      
-      // Process each operation
-      operations.forEach(operation => {
-        if (operation.type === 'bookmark') {
-          // Sync bookmark with summary
-          fetch(`/bookmark/${operation.articleId}`, {
-            method: 'POST',
-            headers: {
-              'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-              summary: operation.summary // Include summary in the request
-            })
-          })
-          .then(response => response.json())
-          .then(data => {
-            if (data.success) {
-              // Remove from sync queue
-              idbPromise.clearFromSyncQueue(operation.id);
-            }
-          });
-        } else if (operation.type === 'note') {
-          // Sync note
-          fetch(`/notes/${operation.articleId}`, {
-            method: 'POST',
-            headers: {
-              'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-              content: operation.content
-            })
-          })
-          .then(response => {
-            if (response.ok) {
-              // Remove from sync queue
-              idbPromise.clearFromSyncQueue(operation.id);
-            }
-          });
-        } else if (operation.type === 'deleteNote') {
-          // Sync note deletion
-          fetch(`/notes/delete/${operation.noteId}`, {
-            method: 'POST',
-            headers: {
-              'Content-Type': 'application/json',
-            }
-          })
-          .then(response => response.json())
-          .then(data => {
-            if (data.success) {
-              // Remove from sync queue
-              idbPromise.clearFromSyncQueue(operation.id);
-            }
-          });
-        } else if (operation.type === 'removeBookmark') {
-          // Sync bookmark removal
-          fetch(`/bookmark/${operation.bookmarkId}`, {
-            method: 'POST',
-            headers: {
-              'Content-Type': 'application/json',
-            }
-          })
-          .then(response => response.json())
-          .then(data => {
-            if (data.success) {
-              // Remove from sync queue
-              idbPromise.clearFromSyncQueue(operation.id);
-            }
-          });
-        }
-      });
+    .then(pushOperations)
+    .then(() => Promise.all([pullChanges('bookmarks'), pullChanges('notes')]))
+    .catch(error => console.error('Error syncing data:', error));
+}
+
+// Random id for this browser, so operation keys stay unique across devices
+function syncClientId() {
+  let clientId = localStorage.getItem('syncClientId');
+  if (!clientId) {
+    clientId = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    localStorage.setItem('syncClientId', clientId);
+  }
+  return clientId;
+}
+
+// Send the whole offline queue to /api/sync in one request. Each operation
+// carries an idempotency key, so a batch retried after a dropped response is
+// not applied twice.
+const SYNC_BATCH_SIZE = 200; // Server limit per request
+
+function pushOperations(operations) {
+  if (operations.length === 0) return;
+  
+  const clientId = syncClientId();
+  const queueIds = {};
+  const batch = operations.slice(0, SYNC_BATCH_SIZE).map(operation => {
+    const key = `${clientId}:${operation.id}`;
+    queueIds[key] = operation.id;
+    return {
+      key: key,
+      type: operation.type,
+      article_id: operation.articleId,
+      // Older queued deletes carry the id as read from a data attribute
+      note_id: operation.noteId === undefined ? undefined : Number(operation.noteId),
+      bookmarked: operation.type === 'bookmark' ? operation.bookmarked !== false : false,
+      content: operation.content
+    };
+  });
+  
+  return fetch('/api/sync', {
+    method: 'POST',
+    credentials: 'same-origin',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ operations: batch })
+  })
+    .then(response => {
+      if (response.status === 401) return null; // Logged out; keep the queue for later
+      if (!response.ok) throw new Error(`Sync failed with status ${response.status}`);
+      return response.json();
+    })
+    .then(data => {
+      if (!data) return;
+      // Operations that failed permanently (e.g. a deleted article) are dropped too
+      const done = data.results.filter(result => !result.retry && result.key in queueIds);
+      return Promise.all(done.map(result => idbPromise.clearFromSyncQueue(queueIds[result.key])))
+        .then(() => pushOperations(operations.slice(SYNC_BATCH_SIZE)));
     });
-}
\ No newline at end of file
+}
@@ -4,7 +4,7 @@
 const idbPromise = {
   // Database name and version
   dbName: 'upsc-news-hub',
-  dbVersion: 2, // Incremented version to ensure schema updates
+  dbVersion: 3, // Incremented version to ensure schema updates
   
   // Open database connection
   openDB: function() {
@@ -61,6 +61,11 @@ const idbPromise = {
         if (!db.objectStoreNames.contains('syncQueue')) {
           db.createObjectStore('syncQueue', { keyPath: 'id', autoIncrement: true });
         }
+        
+        // Create articles store for offline reading
+        if (!db.objectStoreNames.contains('articles')) {
+          db.createObjectStore('articles', { keyPath: 'id' });
+        }
       };
       
       request.onsuccess = event => {
@@ -248,6 +253,46 @@ const idbPromise = {
     });
   },
   
+  // Replace the whole contents of a store in one transaction (full sync)
+  replaceAll: function(storeName, items) {
+    return this.openDB().then(db => {
+      return new Promise((resolve, reject) => {
+        const transaction = db.transaction(storeName, 'readwrite');
+        const store = transaction.objectStore(storeName);
+        store.clear();
+        items.forEach(item => store.put(item));
+        
+        transaction.oncomplete = () => {
+          resolve();
+        };
+        
+        transaction.onerror = event => {
+          reject('Error replacing items: ' + event.target.errorCode);
+        };
+      });
+    });
+  },
+  
+  // Apply changed and deleted rows to a store in one transaction (delta sync)
+  applyChanges: function(storeName, items, deletedIds) {
+    return this.openDB().then(db => {
+      return new Promise((resolve, reject) => {
+        const transaction = db.transaction(storeName, 'readwrite');
+        const store = transaction.objectStore(storeName);
+        items.forEach(item => store.put(item));
+        deletedIds.forEach(id => store.delete(id));
+        
+        transaction.oncomplete = () => {
+          resolve();
+        };
+        
+        transaction.onerror = event => {
+          reject('Error applying changes: ' + event.target.errorCode);
+        };
+      });
+    });
+  },
+  
   // Delete item from store
   delete: function(storeName, id) {
     return this.openDB().then(db => {
@@ -337,4 +382,7 @@ const idbPromise = {
       return Promise.all(promises);
     });
   }
-};
\ No newline at end of file
+};
+
+// Expose for app.js, which checks window.idbPromise before using it
+window.idbPromise = idbPromise;
@@ -1,5 +1,5 @@
-const CACHE_NAME = 'upsc-news-hub-v1';
-const DYNAMIC_CACHE = 'upsc-news-dynamic-v1';
+const CACHE_NAME = 'upsc-news-hub-v2';
+const DYNAMIC_CACHE = 'upsc-news-dynamic-v2';
 
 // Assets to cache on install
 const STATIC_ASSETS = [
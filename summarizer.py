@@ -0,0 +1,130 @@
+import functools
+import logging
+import re
+
+import numpy as np
+
+LANGUAGE = "english"
+SUMMARY_SENTENCES = 4
+MIN_WORDS = 50
+MAX_CHARS = 100000     # Longer texts are cut before sentence splitting
+MAX_SENTENCES = 300    # Only the leading sentences are ranked; keeps the matrix small
+DAMPING = 0.85
+EPSILON = 1e-4
+MAX_ITERATIONS = 100
+EXCERPT_CHARS = 600    # Shown instead of a summary when summarizing failed
+_ZERO_DIVISION_PREVENTION = 1e-7
+_WORD_PATTERN = re.compile(r"^[^\W\d_](?:[^\W\d_]|['-])*$")
+
+# Stored with memoized summaries; bump when the output can change
+TEXTRANK_VERSION = f"textrank-numpy-1-{SUMMARY_SENTENCES}"
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=None)
+def _components(language=LANGUAGE):
+    """Tokenizer, cached stemmer and stop words, built once per process."""
+    from sumy.nlp.stemmers import Stemmer
+    from sumy.nlp.tokenizers import Tokenizer
+    from sumy.utils import get_stop_words
+
+    stem = functools.lru_cache(maxsize=65536)(Stemmer(language))
+    return Tokenizer(language), stem, frozenset(get_stop_words(language))
+
+
+def split_sentences(text, language=LANGUAGE):
+    """Sentences of the text, paragraph by paragraph, as sumy's plain-text parser sees them."""
+    tokenizer, _, _ = _components(language)
+    sentences = []
+    for paragraph in re.split(r'\n\s*\n', text[:MAX_CHARS]):
+        paragraph = ' '.join(line.strip() for line in paragraph.splitlines() if line.strip())
+        if paragraph:
+            sentences.extend(tokenizer.to_sentences(paragraph))
+    return sentences
+
+
+def sentence_terms(sentences, language=LANGUAGE):
+    """Stemmed, stop-word-free word lists per sentence."""
+    tokenizer, stem, stop_words = _components(language)
+    terms = []
+    for sentence in sentences:
+        words = (word.lower() for word in tokenizer.to_words(sentence) if _WORD_PATTERN.match(word))
+        terms.append([stem(word) for word in words if word not in stop_words])
+    return terms
+
+
+def similarity_matrix(terms):
+    """TextRank edge weights: shared term count over log(len_i) + log(len_j)."""
+    vocabulary = {}
+    rows, cols = [], []
+    for i, words in enumerate(terms):
+        for word in words:
+            rows.append(i)
+            cols.append(vocabulary.setdefault(word, len(vocabulary)))
+
+    counts = np.zeros((len(terms), max(len(vocabulary), 1)), dtype=np.float64)
+    np.add.at(counts, (rows, cols), 1.0)
+    overlap = counts @ counts.T
+
+    log_lengths = np.log(np.maximum(counts.sum(axis=1), 1.0))
+    norm = log_lengths[:, None] + log_lengths[None, :]
+    # Two single-word sentences have a zero norm; their weight is the raw overlap
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weights = np.where(np.isclose(norm, 0.0), overlap, overlap / norm)
+    return np.where(overlap > 0, weights, 0.0)
+
+
+def textrank_scores(weights, damping=DAMPING, epsilon=EPSILON):
+    """Stationary distribution of the damped random walk over sentence weights."""
+    count = len(weights)
+    transitions = weights / (weights.sum(axis=1, keepdims=True) + _ZERO_DIVISION_PREVENTION)
+    matrix = np.full((count, count), (1.0 - damping) / count) + damping * transitions
+
+    transposed = matrix.T
+    scores = np.full(count, 1.0 / count)
+    for _ in range(MAX_ITERATIONS):
+        next_scores = transposed @ scores
+        delta = np.linalg.norm(next_scores - scores)
+        scores = next_scores
+        if delta <= epsilon:
+            break
+    return scores
+
+
+def summarize(text, sentences_count=SUMMARY_SENTENCES, language=LANGUAGE):
+    """Top-ranked sentences in document order; short texts are returned unchanged."""
+    if not text or len(text.split()) < MIN_WORDS:
+        return text
+
+    sentences = split_sentences(text, language)[:MAX_SENTENCES]
+    if len(sentences) <= sentences_count:
+        return " ".join(sentences)
+
+    scores = textrank_scores(similarity_matrix(sentence_terms(sentences, language)))
+    # Stable so ties keep document order, as sumy does
+    best = np.sort(np.argsort(-scores, kind='stable')[:sentences_count])
+    return " ".join(sentences[i] for i in best)
+
+
+def excerpt(text, max_chars=EXCERPT_CHARS):
+    """Leading part of the text cut at a word boundary, for display when there is no summary."""
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0] + "…"
+
+
+def _summarize_or_none(text, sentences_count=SUMMARY_SENTENCES):
+    try:
+        return summarize(text, sentences_count)
+    except Exception as e:
+        logger.error(f"Summarization error: {e}")
+        return None
+
+
+def summarize_articles(texts, executor=None, sentences_count=SUMMARY_SENTENCES, chunksize=2):
+    """Summarize texts in order, spread over a process pool when one is given; failures return None."""
+    func = functools.partial(_summarize_or_none, sentences_count=sentences_count)
+    if executor is None:
+        return [func(text) for text in texts]
+    return list(executor.map(func, texts, chunksize=chunksize))
@@ -0,0 +1,18 @@
+"""WSGI entry point: `gunicorn -c gunicorn.conf.py wsgi:app`."""
+import os
+
+import app4
+
+app = app4.app
+
+# Loaded at import so that with gunicorn's preload_app the master loads the
+# models and index once and every forked worker shares the pages copy-on-write
+app4.init_db()
+app4.load_models()
+# The master's connection must not be used after fork; workers open their own
+app4.get_db().close()
+app4.db_local.conn = None
+
+if not os.environ.get('UPSC_DEFER_WORKER_START'):
+    # Single-process servers; gunicorn.conf.py starts each worker from post_fork
+    app4.start_worker()